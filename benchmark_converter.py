@@ -0,0 +1,139 @@
+from pathlib import Path
+import contextlib
+import statistics
+import tempfile
+import argparse
+import platform
+import tracemalloc
+import json
+import time
+import io
+import sys
+import os
+
+import convert_psx_map
+from convert_psx_map import (
+    MAP_WIDTH, MAP_HEIGHT, MAP_MAX_Z,
+    read_gmp_file, read_psx_map, get_psx_map_views, PSX_CMAP_decompress, PSX_CMAP_decompress_volume,
+    get_cell_stacks, iter_umap_rows, get_gmp_zones, get_gmp_anims, create_gmp,
+)
+from generate_psx_map import generate_psx_map
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+
+NUM_BLOCKS = (MAP_WIDTH+1)*(MAP_HEIGHT+1)*(MAP_MAX_Z+1)
+
+# synthetic maps used when no PSX map is given
+SYNTHETIC_MAPS = dict(default = dict(),
+                      shared_columns = dict(num_columns=500, column_sharing=0.9),
+                      unique_columns = dict(num_columns=9000, column_sharing=0.0),
+                      slopes = dict(slope_density=0.8),
+                      lid_only = dict(lid_only_ratio=0.8))
+
+def time_stage(stage, repeat):
+    """Run a stage repeat times and return its timings in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+def measure_peak_memory(stage):
+    """Run a stage once under tracemalloc and return the peak of its allocations in bytes."""
+    tracemalloc.start()
+    try:
+        stage()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark_map(psx_gmp_path, output_dir, repeat):
+    gmp_size = os.path.getsize(psx_gmp_path)
+    output_path = Path(output_dir) / "benchmark_output.gmp"
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        gmp_data = read_gmp_file(psx_gmp_path)
+        chunk_infos, cmap_info = read_psx_map(gmp_data)
+        psx_views = get_psx_map_views(gmp_data, chunk_infos, cmap_info)
+        cell_stacks = get_cell_stacks(psx_views)
+    zones_info_array = get_gmp_zones(psx_views)
+    all_anim_data = get_gmp_anims(psx_views)
+
+    def read_stage():
+        read_psx_map(read_gmp_file(psx_gmp_path))
+
+    def create_stage():
+        # the rows are streamed to the file as convert_psx_file does, the columns are decoded beforehand
+        create_gmp(output_path, iter_umap_rows(cell_stacks), zones_info_array, all_anim_data, chunk_infos, None)
+
+    # stage name, callable, amount of work and its unit for the throughput
+    stages = [ ("read_psx_map", read_stage, gmp_size / 2**20, "MB/s"),
+               ("PSX_CMAP_decompress", lambda: PSX_CMAP_decompress(psx_views), NUM_BLOCKS, "blocks/s"),
+               ("PSX_CMAP_decompress_volume", lambda: PSX_CMAP_decompress_volume(psx_views), NUM_BLOCKS, "blocks/s"),
+               ("get_gmp_zones", lambda: get_gmp_zones(psx_views), len(zones_info_array), "zones/s"),
+               ("get_gmp_anims", lambda: get_gmp_anims(psx_views), len(all_anim_data), "anims/s"),
+               ("create_gmp", create_stage, None, "MB/s") ]
+
+    results = dict(map = str(psx_gmp_path), size = gmp_size, stages = {})
+
+    for stage_name, stage, work, unit in stages:
+        with contextlib.redirect_stdout(io.StringIO()):
+            timings = time_stage(stage, repeat)
+            peak_memory = measure_peak_memory(stage)
+
+        if work is None:    # create_gmp: measured on what it wrote
+            work = os.path.getsize(output_path) / 2**20
+
+        best_time = min(timings)
+        results["stages"][stage_name] = dict(best = best_time,
+                                             median = statistics.median(timings),
+                                             timings = timings,
+                                             throughput = work / best_time if best_time else None,
+                                             throughput_unit = unit,
+                                             peak_memory = peak_memory)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Benchmark the PSX gmp converter stages.")
+    parser.add_argument("psx_gmp_paths", nargs='*', help="PSX gmp maps to benchmark (default: synthetic maps)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="timed runs per stage (default: 3)")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="JSON results file (default: bench_results.json)")
+    args = parser.parse_args()
+
+    report = dict(python = platform.python_version(),
+                  platform = platform.platform(),
+                  converter = str(Path(convert_psx_map.__file__).name),
+                  date = time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  repeat = args.repeat,
+                  maps = [])
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        psx_gmp_paths = [ Path(path) for path in args.psx_gmp_paths ]
+        if not psx_gmp_paths:
+            for map_name, map_options in SYNTHETIC_MAPS.items():
+                psx_gmp_path = Path(work_dir) / f"{map_name}.GMP"
+                with open(psx_gmp_path, 'wb') as file:
+                    file.write(generate_psx_map(**map_options))
+                psx_gmp_paths.append(psx_gmp_path)
+
+        for psx_gmp_path in psx_gmp_paths:
+            print(f"\n{psx_gmp_path.name} ({os.path.getsize(psx_gmp_path):,} bytes)")
+            map_results = benchmark_map(psx_gmp_path, work_dir, args.repeat)
+            if not args.psx_gmp_paths:
+                map_results["map"] = psx_gmp_path.name
+            report["maps"].append(map_results)
+
+            for stage_name, stage_results in map_results["stages"].items():
+                print(f"  {stage_name:<28} {stage_results['best']*1000:10.2f} ms "
+                      f"{stage_results['throughput']:14,.1f} {stage_results['throughput_unit']:<9} "
+                      f"peak {stage_results['peak_memory'] / 2**20:8.2f} MB")
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
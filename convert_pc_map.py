@@ -0,0 +1,163 @@
+from pathlib import Path
+from array import array
+import argparse
+import time
+import sys
+import os
+
+from convert_psx_map import (
+    ROOT_DIR, FIRST_CMAP_PADDING_SIZE, SECOND_CMAP_PADDING_SIZE,
+    PcMapError, read_gmp_file, atomic_output, read_pc_map, get_pc_umap, compress_umap, words_to_bytes, pad_psx_chunk,
+)
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+
+LID_BLOCK_ID_OFFSET = 32768     # PSX block ids from here point to the lid only table
+MAX_COMPLETE_BLOCKS = 32768
+MAX_LID_BLOCKS_ONLY = 32768
+MAX_COLUMN_WORDS = 65535
+
+NO_SIDES_DATA = bytes(8)
+
+def unfix_psx_slope(block_data):
+    """Undo fix_psx_slope: set back the tile 1023 of 3-sided slopes to 384."""
+    slope_type = block_data[-1] >> 2
+    if (49 <= slope_type <= 52):
+        lid = int.from_bytes(block_data[8:10], 'little')
+        if (lid % 1024) == 1023:
+            lid = (lid & ~1023) | 384
+            return block_data[:8] + bytes([lid % 256, lid // 256]) + block_data[10:]
+    return block_data
+
+def split_psx_blocks(blocks):
+    """Split the PC blocks into the PSX complete and lid only tables.
+
+    Blocks without sides go to the 4-byte lid only table, the others to the
+    12-byte complete table with the slope fix undone. Returns the PSX id of
+    every PC block and both deduplicated tables."""
+    complete_ids = {}
+    lid_ids = {}
+    complete_blocks = []
+    lid_blocks = []
+    psx_block_ids = []
+
+    for block_data in blocks:
+        if block_data[:8] == NO_SIDES_DATA:
+            # PSX lid only blocks aren't slope fixed, so the tile is kept as is
+            lid_data = block_data[8:]
+            block_id = lid_ids.get(lid_data)
+            if block_id is None:
+                block_id = LID_BLOCK_ID_OFFSET + len(lid_blocks)
+                lid_ids[lid_data] = block_id
+                lid_blocks.append(lid_data)
+        else:
+            block_data = unfix_psx_slope(block_data)
+            block_id = complete_ids.get(block_data)
+            if block_id is None:
+                block_id = len(complete_blocks)
+                complete_ids[block_data] = block_id
+                complete_blocks.append(block_data)
+        psx_block_ids.append(block_id)
+
+    if len(complete_blocks) > MAX_COMPLETE_BLOCKS - 1:
+        raise PcMapError(f"Too many complete blocks for a PSX map: {len(complete_blocks)}, max {MAX_COMPLETE_BLOCKS - 1}")
+    if len(lid_blocks) > MAX_LID_BLOCKS_ONLY - 1:
+        raise PcMapError(f"Too many lid only blocks for a PSX map: {len(lid_blocks)}, max {MAX_LID_BLOCKS_ONLY - 1}")
+
+    return psx_block_ids, complete_blocks, lid_blocks
+
+def encode_psx_cmap(umap_data):
+    """Encode a UMAP volume as the data of a PSX CMAP chunk."""
+    base_table, columns, blocks = compress_umap(umap_data)
+    psx_block_ids, complete_blocks, lid_blocks = split_psx_blocks(blocks)
+
+    # the block split can make two PC columns the same PSX column
+    column_word_offsets = {}
+    column_words = array('H')
+    column_offsets = []
+    for column_height, column_offset, column_block_ids in columns:
+        column = (column_height | (column_offset << 8), *[ psx_block_ids[block_id] for block_id in column_block_ids ])
+        words_offset = column_word_offsets.get(column)
+        if words_offset is None:
+            words_offset = len(column_words)
+            column_word_offsets[column] = words_offset
+            column_words.extend(column)
+        column_offsets.append(words_offset)
+
+    if len(column_words) > MAX_COLUMN_WORDS:
+        raise PcMapError(f"Too many column words for a PSX map: {len(column_words)}, max {MAX_COLUMN_WORDS}")
+
+    base_words = array('H', [ column_offsets[column_idx] for column_idx in base_table ])
+
+    return b"".join([ words_to_bytes(base_words),
+                      words_to_bytes(array('H', [len(column_words)])),
+                      words_to_bytes(column_words),
+                      bytes(FIRST_CMAP_PADDING_SIZE),
+                      words_to_bytes(array('H', [len(complete_blocks)])),
+                      b"".join(complete_blocks),
+                      bytes(SECOND_CMAP_PADDING_SIZE),
+                      words_to_bytes(array('H', [len(lid_blocks)])),
+                      b"".join(lid_blocks) ])
+
+def encode_psx_chunk(chunk_name, chunk_data):
+    return b"".join([ chunk_name, len(chunk_data).to_bytes(4, 'little'), pad_psx_chunk(bytes(chunk_data)) ])
+
+def convert_pc_map(pc_gmp_data):
+    """Convert the bytes of a PC gmp map into the bytes of a PSX gmp map."""
+    pc_chunks = read_pc_map(pc_gmp_data)
+
+    for chunk_name in ("ZONE", "ANIM"):
+        if chunk_name not in pc_chunks:
+            raise PcMapError(f"{chunk_name} chunk not found")
+
+    cmap_data = encode_psx_cmap(get_pc_umap(pc_chunks))
+
+    psx_chunks = [ encode_psx_chunk(b"CMAP", cmap_data),
+                   encode_psx_chunk(b"ZONE", pc_chunks["ZONE"]),
+                   encode_psx_chunk(b"ANIM", pc_chunks["ANIM"]) ]
+
+    # the PSX RGEN isn't padded, but its data goes on for 2 bytes after its size
+    if "RGEN" in pc_chunks:
+        rgen_data = pc_chunks["RGEN"]
+        psx_chunks.append(b"".join([ b"RGEN", len(rgen_data).to_bytes(4, 'little'), rgen_data, bytes(2) ]))
+
+    return b"".join(psx_chunks)
+
+def convert_pc_file(pc_gmp_path, output_path):
+    start_time = time.perf_counter()
+
+    psx_gmp_data = convert_pc_map(read_gmp_file(pc_gmp_path))
+
+    with atomic_output(output_path) as file:
+        file.write(psx_gmp_data)
+
+    print(f"Converted {pc_gmp_path} to {output_path} ({len(psx_gmp_data):,} bytes) in {time.perf_counter() - start_time:.2f} s")
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Convert a PC gmp map (UMAP, DMAP or CMAP) back to the PSX format.")
+    parser.add_argument("pc_gmp_path")
+    parser.add_argument("output_gmp_filename")
+    args = parser.parse_args()
+
+    # get input gmp path
+    if ("\\" not in args.pc_gmp_path and "/" not in args.pc_gmp_path):
+        pc_gmp_path = ROOT_DIR / args.pc_gmp_path
+    else:
+        pc_gmp_path = Path(args.pc_gmp_path)
+
+    if (not pc_gmp_path.exists()):
+        print(f"Input gmp file doesn't exists. Path: {pc_gmp_path}")
+        sys.exit(-1)
+
+    output_path = ROOT_DIR / args.output_gmp_filename
+
+    try:
+        convert_pc_file(pc_gmp_path, output_path)
+    except PcMapError as error:
+        print(f"ERROR: {error}")
+        sys.exit(-1)
+
+    print("Success!")
+
+if __name__ == "__main__":
+    main()
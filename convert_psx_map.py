@@ -1,587 +1,2813 @@
-from pathlib import Path
-import shutil
-import argparse
-import sys
-import os
-
-PROGRAM_NAME = os.path.basename(sys.argv[0])
-ROOT_DIR = Path(__file__).parent
-
-MAP_WIDTH = 255
-MAP_HEIGHT = 255
-
-MAP_MAX_Z = 7
-
-BLOCK_INFO_SIZE = 12
-LIGHT_INFO_SIZE = 16
-ZONE_TYPE_COORDS_DATA_SIZE = 5     # not includes the name length neither the name itself
-
-LIGHT_MAX_X = 32767     # 255*128 + 64 - 1, where 64 = max offset
-LIGHT_MAX_Y = 32767     # 255*128 + 64 - 1
-
-CMAP_DATA_SIZE = 256*256*2
-BLOCK_INFO_PAD_SIZE = int("0x600", 16)
-
-FIRST_CMAP_PADDING_SIZE = int("0x400", 16)
-SECOND_CMAP_PADDING_SIZE = int("0x600", 16)
-
-CHUNK_PADDING_BYTE = int("0xAA", 16)
-
-UMAP_SIZE = BLOCK_INFO_SIZE*256*256*8
-
-def get_filename(path):
-    str_path = str(path)
-    i = str_path.rfind('\\') + 1
-    j = str_path.rfind('.')
-    return str_path[i:j]
-
-def convert_int_to_dword(integer):  # low endian
-    """Convert a integer to a four byte array in little endian."""
-    b1 = integer % 256
-    b2 = (integer >> 8) % 256
-    b3 = (integer >> 16) % 256
-    b4 = (integer >> 24) % 256
-    return bytes([b1, b2, b3, b4])
-
-def convert_int_to_word(integer):  # low endian
-    """Convert a integer to a two byte array in little endian."""
-    b1 = integer % 256
-    b2 = integer // 256
-    return bytes([b1, b2])
-
-def read_block_side_info(side, str_side):
-    tile_texture_idx = (side % 1024)
-    side = side >> 10
-
-    wall = (side % 2)
-    side = side >> 1
-
-    bullet_wall = (side % 2)
-    side = side >> 1
-
-    flat = (side % 2)
-    side = side >> 1
-
-    flip = (side % 2)
-    side = side >> 1
-
-    tile_rotation = side
-
-    print(f"{str_side} tile: {tile_texture_idx}")
-    #print(f"Tile rotation: {return_rotation_value_str(tile_rotation)}°")
-    #print(f"Wall: {wall}, Bullet Wall: {bullet_wall}")
-    #print(f"Flat: {flat}")
-    #print(f"Flip: {flip}")
-
-def read_lid_info(lid):
-    tile_texture_idx = (lid % 1024)
-    lid = lid >> 10
-
-    lighting_filter = (lid % 4)
-    lid = lid >> 2
-
-    flat = (lid % 2)
-    lid = lid >> 1
-
-    flip = (lid % 2)
-    lid = lid >> 1
-
-    tile_rotation = lid
-
-    print(f"Lid tile: {tile_texture_idx}")
-    #print(f"Tile rotation: {tile_rotation}°")
-    #print(f"Filter: {lighting_filter}")
-    #print(f"Flat: {flat}")
-    #print(f"Flip: {flip}")
-
-def is_slope(block_data):
-    slope_byte = block_data[-1]
-    slope_byte = slope_byte >> 2
-    if (slope_byte == 0):
-        return False
-    if (slope_byte > 60):
-        return False
-    return True
-
-def print_all_info_block_data(block_data):
-    left_side = int.from_bytes(block_data[0:2], 'little')
-    right_side = int.from_bytes(block_data[2:4], 'little')
-    top_side = int.from_bytes(block_data[4:6], 'little')
-    bottom_side = int.from_bytes(block_data[6:8], 'little')
-    lid = int.from_bytes(block_data[8:10], 'little')
-
-    #print("Left side info:")
-    read_block_side_info(left_side, "Left")
-
-    #print("\nRight side info:")
-    read_block_side_info(right_side, "Right")
-
-    #print("\nTop side info:")
-    read_block_side_info(top_side, "Top")
-
-    #print("\nBottom side info:")
-    read_block_side_info(bottom_side, "Bottom")
-
-    #print("\nLid info:")
-    read_lid_info(lid)
-
-def fix_psx_slope(block_data):
-    slope_byte = block_data[-1]
-    slope_type = slope_byte >> 2
-    if (49 <= slope_type <= 52):
-        lid = int.from_bytes(block_data[8:10], 'little')
-        tile_texture_idx = (lid % 1024)
-        if tile_texture_idx == 384:
-            tile_texture_idx = 1023
-            lid = lid | tile_texture_idx    # set all lowest 10 bits to 1  (1111 1111 11 = 1023)
-            new_block_data = block_data[:8] + bytes([lid % 256, lid // 256]) + block_data[10:]
-        else:
-            new_block_data = block_data     # do nothing
-    else:
-        new_block_data = block_data     # do nothing
-    return new_block_data
-
-def read_psx_map(gmp_path):
-
-    psx_chunk_info = dict(CMAP = [None, None], 
-                   ZONE = [None, None], 
-                   ANIM = [None, None],
-                   RGEN = [None, None])
-
-    cmap_info =  dict(column_start = None, 
-                   block_info_1_start = None, 
-                   block_info_2_start = None,
-                   column_words = None,
-                   num_complete_blocks = None,
-                   num_lid_blocks_only = None)
-    
-    with open(gmp_path, 'rb') as file:
-
-        data_offset = file.tell()
-        size = file.seek(0, os.SEEK_END)
-        file.seek(data_offset)
-
-        print("File Size: {:,} bytes".format(size))
-
-        current_offset = data_offset
-
-        while (current_offset < size):
-            chunk_header = file.read(4).decode('ascii')
-            current_offset += 4
-            if (chunk_header == "CMAP" 
-                or chunk_header == "ZONE"
-                or chunk_header == "ANIM"
-                or chunk_header == "RGEN"
-                ):
-                header_data_offset = file.tell() + 4
-                psx_chunk_info[chunk_header][0] = header_data_offset
-
-                print(f"Header {chunk_header} found! Offset: {hex(header_data_offset)}", end = '')
-
-                if chunk_header == "CMAP":
-                    file.read(4)    # read fake header size
-                    file.read(CMAP_DATA_SIZE)   # skip data
-                    column_words = int.from_bytes(file.read(2), 'little')
-
-                    cmap_info["column_words"] = column_words
-                    cmap_info["column_start"] = file.tell()
-
-                    # skip column data and the first padding: go to first block info section
-                    file.read(2*column_words + FIRST_CMAP_PADDING_SIZE)
-
-                    cmap_info["block_info_1_start"] = file.tell()
-
-                    num_complete_blocks = int.from_bytes(file.read(2), 'little')    # number of blocks with non-null sides
-                    cmap_info["num_complete_blocks"] = num_complete_blocks
-
-                    # skip first block info data section
-                    file.read(num_complete_blocks*BLOCK_INFO_SIZE + SECOND_CMAP_PADDING_SIZE)
-
-                    cmap_info["block_info_2_start"] = file.tell()
-
-                    num_lid_blocks_only = int.from_bytes(file.read(2), 'little')    # number of blocks with only lid, arrow & slope data
-
-                    cmap_info["num_lid_blocks_only"] = num_lid_blocks_only
-
-                    # skip second block info data section
-                    file.read(num_lid_blocks_only*4)
-
-                    #print(f"Tell: {hex(file.tell())}")
-
-                    num_terminators = 0
-
-                    terminator = int.from_bytes(file.read(1))
-                    if terminator == CHUNK_PADDING_BYTE:
-                        while terminator == CHUNK_PADDING_BYTE:
-                            num_terminators += 1
-                            end_offset = file.tell()
-                            terminator = int.from_bytes(file.read(1))
-                    else:
-                        print("ERROR: Wrong CMAP size")
-                        sys.exit(-1)
-                    
-                    file.seek(end_offset)   # get back to finish
-                    chunk_size = end_offset - header_data_offset
-
-                    psx_chunk_info["CMAP"][1] = chunk_size - num_terminators
-                    print(f", Size: {hex(chunk_size)}")
-
-                else:   # chunk_header == "ZONE" or chunk_header == "ANIM" or chunk_header == "RGEN"
-                    data_size = int.from_bytes(file.read(4),'little')
-                    file.read(data_size)
-
-                    num_terminators = 0
-                    
-                    if chunk_header != "RGEN":
-                        terminator = int.from_bytes(file.read(1))
-                        if terminator == CHUNK_PADDING_BYTE:
-                            while terminator == CHUNK_PADDING_BYTE:
-                                num_terminators += 1
-                                end_offset = file.tell()
-                                terminator = int.from_bytes(file.read(1))
-                        else:
-                            print("ERROR: Wrong chunk size")
-                            sys.exit(-1)
-
-                        file.seek(end_offset)   # get back to chunk finish offset
-                    else:
-                        end_offset = file.tell() + 2
-                        current_offset += 2
-
-                    
-                    
-                    chunk_size = end_offset - header_data_offset
-
-                    psx_chunk_info[chunk_header][1] = chunk_size - num_terminators
-                    print(f", Size: {hex(chunk_size)}")
-
-                current_offset += chunk_size + 4 + num_terminators
-    print("")
-    return ( psx_chunk_info, cmap_info )
-
-def write_uncompressed_map(output_path, chunk_infos, block_info_array):
-    with open(output_path, 'r+b') as file:
-        
-        umap_offset = chunk_infos["UMAP"][0]
-        size = chunk_infos["UMAP"][1]
-
-        file.seek(umap_offset)
-        
-        current_offset = umap_offset
-
-        x = 0
-        y = 0
-        z = 0
-
-        while (current_offset < umap_offset + size):
-            file.write(block_info_array[z][y][x])
-
-            x += 1
-
-            if (x > 255):
-                x = 0
-                y += 1
-                
-            if (y > 255):
-                y = 0
-                z += 1
-                
-            if (z >= 8):
-                break
-
-############ CMAP stuff
-
-def CMAP_read_all_columns(gmp_path, chunk_infos):
-    
-    with open(gmp_path, 'rb') as file:
-        
-        dmap_offset = chunk_infos["CMAP"][0]
-        size = chunk_infos["CMAP"][1]
-
-        file.seek(dmap_offset + CMAP_DATA_SIZE)
-        column_words = int.from_bytes(file.read(2), 'little')
-
-        print(f"Num of columns words: {column_words}")
-
-        words = 0
-        column_idx = 0
-
-        while (words < column_words):
-            start_offset = file.tell()
-
-            column_height = int.from_bytes(file.read(1))
-            column_offset = int.from_bytes(file.read(1))
-            num_blocks = column_height - column_offset
-            
-            if column_height > 7:
-                print(f"\nError: height {column_height} above 7. Column {column_idx} at offset {hex(start_offset)}")
-                print(f"words count = {words}")
-                sys.exit(-1)
-
-            if column_offset > 7:
-                print(f"\nError: BlockOffset {column_offset} above 7. Column {column_idx} at offset {hex(start_offset)}")
-                print(f"words count = {words}")
-                sys.exit(-1)
-
-            # get back to start position
-            file.seek(start_offset)
-
-            # 1 for height, 1 for offset, 2*num_blocks for blockd
-            column_size = 1 + 1 + 2*num_blocks
-
-            if column_size < 0:
-                print(f"ERROR: negative column_size: {column_size}")
-                print(f"Column: {column_idx}, Height = {column_height}, Block Offset = {column_offset}")
-                print(f"File Offset: {hex(start_offset)}")
-                sys.exit(-1)
-
-            file.read(column_size)
-
-            words += column_size // 2
-            column_idx += 1
-        
-        print(f"Number of columns: {column_idx}")
-
-        column_finish_offset = file.tell()
-        print(f"Column data start offset: {hex(dmap_offset + CMAP_DATA_SIZE + 2)}")
-        print(f"Column data finish offset: {hex(column_finish_offset)}")
-
-        block_data_info_offset = column_finish_offset + 1024 # TODO: psx vs pc CMAP: include 1024 (padding?)
-        
-
-        file.seek(block_data_info_offset)  
-        num_total_blocks = int.from_bytes(file.read(2), 'little')
-        print(f"Num unique blocks: {num_total_blocks}")
-
-        block_data_finish_offset = block_data_info_offset + num_total_blocks*BLOCK_INFO_SIZE
-
-
-    print(f"Block info start offset = {hex(block_data_info_offset)}")
-    print(f"Block info end offset = {hex(block_data_finish_offset)}")
-
-    return block_data_info_offset + 2, block_data_finish_offset, num_total_blocks
-
-def PSX_CMAP_decompress(gmp_path, chunk_infos, cmap_info):
-    strange_blocks = 0
-    normal_blocks = 0
-    max_idx_below_8000 = 0
-    max_idx_above_8000 = 0
-    min_idx_above_8000 = 40000
-    # initialize block info array with empty blocks
-    empty_block_data = bytes([0 for _ in range(BLOCK_INFO_SIZE)])
-    block_info_array = [ [ [empty_block_data for _ in range(MAP_WIDTH+1)] for _ in range(MAP_HEIGHT+1) ] for _ in range(MAP_MAX_Z+1) ]
-
-    with open(gmp_path, 'rb') as file:
-        
-        cmap_offset = chunk_infos["CMAP"][0]
-        size = chunk_infos["CMAP"][1]
-
-        # block info data starts at
-        block_info_array_offset = cmap_info["block_info_1_start"] + 2   #block_data_info_offset
-
-        #print(f"Unknown data again: {hex(block_data_finish_offset + 1536 + 4)}")
-
-        for y in range(MAP_HEIGHT+1):
-            for x in range(MAP_WIDTH+1):
-                tgt_block_column_data_offset = cmap_offset + 2*(x + y*256)
-
-                file.seek(tgt_block_column_data_offset)
-
-                words_offset = int.from_bytes(file.read(2), 'little')
-                tgt_column_offset = cmap_offset + CMAP_DATA_SIZE + 2 + 2*words_offset
-
-                file.seek(tgt_column_offset)
-
-                column_height = int.from_bytes(file.read(1))
-                column_offset = int.from_bytes(file.read(1))
-                num_blocks = column_height - column_offset
-
-                #if x == 20 and y == 75:
-                #    print(f"({x}, {y}) Column offset: {hex(tgt_column_offset)}")
-
-                all_column_blocks_id = []
-
-                # get all block ids from this column
-                for block_idx in range(num_blocks):
-                    block_id = int.from_bytes( file.read(2), 'little' )
-
-                    # TODO: testing
-                    if block_id >= 32768:
-                        strange_blocks += 1
-                        if block_id > max_idx_above_8000:
-                            max_idx_above_8000 = block_id
-                        if block_id < min_idx_above_8000:
-                            min_idx_above_8000 = block_id
-                    else:
-                        normal_blocks += 1
-                        if block_id > max_idx_below_8000:
-                            max_idx_below_8000 = block_id
-
-                    all_column_blocks_id.append( block_id )
-
-                # get block info from each block using its id
-                for blockd_idx, block_id in enumerate(all_column_blocks_id):
-                    if (block_id < 32768):
-                        block_info_offset = block_info_array_offset + BLOCK_INFO_SIZE*block_id  #block_id*BLOCK_INFO_SIZE
-                        file.seek( block_info_offset )
-                        block_data = file.read(BLOCK_INFO_SIZE)
-
-                        # now fix tile 384 to 1023 for 3-sided slopes
-                        if is_slope(block_data):
-                            block_data = fix_psx_slope(block_data)
-                    else:
-                        block_info_offset = cmap_info["block_info_2_start"] + 2 + 4*(block_id - 32768)
-                        file.seek( block_info_offset )
-                        lid_slope_data = file.read(4)
-                        block_data = bytes([0,0  ,  0,0  ,  0,0  ,  0,0 ]) + lid_slope_data
-                    
-                    z = column_offset + blockd_idx
-                    block_info_array[z][y][x] = block_data
-
-    return block_info_array
-
-def get_gmp_zones(psx_gmp_path, chunk_infos):
-    zones_data_array = []
-    with open(psx_gmp_path, 'rb') as file:
-
-        zone_offset = chunk_infos["ZONE"][0]
-        size = chunk_infos["ZONE"][1]
-
-        file.seek(zone_offset)
-        
-        current_offset = zone_offset
-        while (current_offset < zone_offset + size):
-            zone_info = file.read(ZONE_TYPE_COORDS_DATA_SIZE)
-
-            current_offset += ZONE_TYPE_COORDS_DATA_SIZE
-
-            name_length = int.from_bytes(file.read(1))
-            zone_name_data = file.read(name_length)
-            current_offset += 1 + name_length
-
-            zone_data = zone_info + int.to_bytes(name_length) + zone_name_data
-            zones_data_array.append(zone_data)
-
-    return zones_data_array
-
-def get_gmp_anims(psx_gmp_path, chunk_infos):
-
-    with open(psx_gmp_path, 'rb') as file:
-
-        anim_offset = chunk_infos["ANIM"][0]
-        size = chunk_infos["ANIM"][1]
-
-        file.seek(anim_offset)
-
-        all_anim_data = file.read(size)
-
-    return all_anim_data
-
-
-def create_gmp(output_path, block_info_array, zones_info_array, all_anim_data, chunk_info, edit_file):
-    with open(output_path, 'w+b') as file:
-        signature = str.encode("GBMP")
-        file.write(signature)
-
-        version = convert_int_to_word(500)
-        file.write(version)
-
-        # UMAP
-        chunk_header = str.encode("UMAP")
-        file.write(chunk_header)
-
-        umap_size = convert_int_to_dword(UMAP_SIZE)
-        file.write(umap_size)
-
-        for z in range(len(block_info_array)):
-            for y in range(len(block_info_array[z])):
-                for x in range(len(block_info_array[z][y])):
-                    file.write(block_info_array[z][y][x])
-
-        # ZONE
-        chunk_header = str.encode("ZONE")
-        file.write(chunk_header)
-
-        zone_size = convert_int_to_dword(chunk_info["ZONE"][1])
-        file.write(zone_size)
-
-        for zone in zones_info_array:
-            file.write(zone)
-
-        # ANIM
-        chunk_header = str.encode("ANIM")
-        file.write(chunk_header)
-
-        anim_size = convert_int_to_dword(chunk_info["ANIM"][1])
-        file.write(anim_size)
-
-        file.write(all_anim_data)
-
-        # EDIT
-        if edit_file is not None:
-            edit_file_path = ROOT_DIR / edit_file
-            if edit_file_path.exists():
-                with open(edit_file_path, 'rb') as edit_file:
-                    edit_data = edit_file.read()
-                    file.write(edit_data)
-            else:
-                print(f"Warning: {edit_file_path} don't exist!")
-        
-        
-    return
-
-def main():
-    parser = argparse.ArgumentParser(PROGRAM_NAME)
-    parser.add_argument("psx_gmp_path")
-    parser.add_argument("output_gmp_filename")
-    parser.add_argument("edit_file", nargs='?')
-    args = parser.parse_args()
-
-    if (not args.psx_gmp_path or not args.output_gmp_filename):
-        print("Usage: python [program path] [psx gmp path] [output gmp filename]")
-        sys.exit(-1)
-
-    # get input gmp path
-    if ("\\" not in args.psx_gmp_path and "/" not in args.psx_gmp_path):
-        psx_gmp_path = ROOT_DIR / args.psx_gmp_path
-    else:
-        psx_gmp_path = Path(args.psx_gmp_path)
-
-    # verify if the input gmp map exists
-    if (not psx_gmp_path.exists()):
-        print(f"Input gmp file doesn't exists. Path: {psx_gmp_path}")
-        sys.exit(-1)
-    
-    print(f"\nOpening file {psx_gmp_path}...\n")
-    chunk_infos, cmap_info = read_psx_map(psx_gmp_path)
-
-    print("Column start offset: {}".format(hex(cmap_info["column_start"])))
-    print("Complete block info start offset: {}".format(hex(cmap_info["block_info_1_start"])))
-    print("Lid only block info start offset: {}".format(hex(cmap_info["block_info_2_start"])))
-    print("Num of unique complete blocks: {}".format(cmap_info["num_complete_blocks"]))
-    print("Num of unique lid only blocks: {}".format(cmap_info["num_lid_blocks_only"]))
-
-    #return
-
-    block_info_array = PSX_CMAP_decompress(psx_gmp_path, chunk_infos, cmap_info)
-    zones_info_array = get_gmp_zones(psx_gmp_path, chunk_infos)
-    all_anim_data = get_gmp_anims(psx_gmp_path, chunk_infos)
-    
-    #write_uncompressed_map(output_path, tgt_chunk_infos, block_info_array)
-
-    if args.edit_file:
-        edit_file = args.edit_file
-    else:
-        edit_file = None
-
-    # now create the gmp file
-    output_path = ROOT_DIR / args.output_gmp_filename
-
-    print(f"Creating gmp file at {output_path}...")
-    create_gmp(output_path, block_info_array, zones_info_array, all_anim_data, chunk_infos, edit_file)
-    print("Success!")
-        
-
-
-if __name__ == "__main__":
+from pathlib import Path
+from array import array
+from operator import itemgetter
+from functools import lru_cache
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import hashlib
+import base64
+import zlib
+import tracemalloc
+import cProfile
+import shutil
+import struct
+import argparse
+import sys
+import os
+import io
+import re
+import json
+import time
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+ROOT_DIR = Path(__file__).parent
+
+MAP_WIDTH = 255
+MAP_HEIGHT = 255
+
+MAP_MAX_Z = 7
+
+BLOCK_INFO_SIZE = 12
+LIGHT_INFO_SIZE = 16
+ZONE_TYPE_COORDS_DATA_SIZE = 5     # not includes the name length neither the name itself
+
+LIGHT_MAX_X = 32767     # 255*128 + 64 - 1, where 64 = max offset
+LIGHT_MAX_Y = 32767     # 255*128 + 64 - 1
+
+CMAP_DATA_SIZE = 256*256*2
+BLOCK_INFO_PAD_SIZE = int("0x600", 16)
+
+FIRST_CMAP_PADDING_SIZE = int("0x400", 16)
+SECOND_CMAP_PADDING_SIZE = int("0x600", 16)
+
+CHUNK_PADDING_BYTE = int("0xAA", 16)
+
+UMAP_SIZE = BLOCK_INFO_SIZE*256*256*8
+UMAP_PLANE_SIZE = BLOCK_INFO_SIZE*256*256
+UMAP_ROW_SIZE = BLOCK_INFO_SIZE*256
+
+EMPTY_BLOCK_DATA = bytes(BLOCK_INFO_SIZE)
+
+PSX_CHUNK_HEADERS = (b"CMAP", b"ZONE", b"ANIM", b"RGEN")
+NON_PADDING_PATTERN = re.compile(b"[^" + re.escape(bytes([CHUNK_PADDING_BYTE])) + b"]")
+
+CHUNK_INDEX_CACHE_SUFFIX = ".index.json"
+
+GMP_VERSION = 500
+GMP_HEADER_STRUCT = struct.Struct('<4sH')       # signature, version
+CHUNK_HEADER_STRUCT = struct.Struct('<4sI')     # chunk name, data size
+
+UMAP_DATA_OFFSET = GMP_HEADER_STRUCT.size + CHUNK_HEADER_STRUCT.size
+
+FINGERPRINT_SUFFIX = ".fingerprint.json"
+FINGERPRINT_VERSION = 3
+
+CONVERTER_VERSION = 2     # bump when the output of a conversion changes, it invalidates the conversion cache
+CONVERSION_CACHE_SUFFIX = ".gmp"
+CONVERSION_CACHE_SIZE = 512*2**20
+
+WATCH_POLL_INTERVAL = 0.25   # seconds between two checks of the watched files
+WATCH_MAX_PATCHED_CELLS = (MAP_WIDTH+1)*(MAP_HEIGHT+1) // 4    # above it the output is written again instead of patched
+
+class PsxMapError(Exception):
+    """Raised when a PSX gmp file doesn't have the expected layout."""
+
+class PsxChunkSizeError(PsxMapError):
+    """Raised when a chunk isn't followed by its 0xAA padding."""
+
+class PsxTruncatedMapError(PsxMapError):
+    """Raised when a chunk goes past the end of the file."""
+
+class PsxMissingChunkError(PsxMapError):
+    """Raised when a required chunk isn't in the file."""
+
+class PsxCorruptMapError(PsxMapError):
+    """Raised when the CMAP data is inconsistent: column bounds, block ids..."""
+
+class CmapTooLargeError(PsxMapError):
+    """Raised when a map has too many column words or blocks for the 16-bit CMAP output."""
+
+class PcMapError(Exception):
+    """Raised when a PC gmp file doesn't have the expected layout."""
+
+# data_offset is right after the chunk size, size doesn't include the padding
+PsxChunk = namedtuple("PsxChunk", ["name", "header_offset", "data_offset", "size", "padding"])
+
+PsxChunkIndex = namedtuple("PsxChunkIndex", ["file_size", "chunks",
+                                             "column_start", "column_words",
+                                             "block_info_1_start", "num_complete_blocks",
+                                             "block_info_2_start", "num_lid_blocks_only"])
+
+def get_filename(path):
+    str_path = str(path)
+    i = str_path.rfind('\\') + 1
+    j = str_path.rfind('.')
+    return str_path[i:j]
+
+def read_block_side_info(side, str_side):
+    tile_texture_idx = (side % 1024)
+    side = side >> 10
+
+    wall = (side % 2)
+    side = side >> 1
+
+    bullet_wall = (side % 2)
+    side = side >> 1
+
+    flat = (side % 2)
+    side = side >> 1
+
+    flip = (side % 2)
+    side = side >> 1
+
+    tile_rotation = side
+
+    print(f"{str_side} tile: {tile_texture_idx}")
+    #print(f"Tile rotation: {return_rotation_value_str(tile_rotation)}°")
+    #print(f"Wall: {wall}, Bullet Wall: {bullet_wall}")
+    #print(f"Flat: {flat}")
+    #print(f"Flip: {flip}")
+
+def read_lid_info(lid):
+    tile_texture_idx = (lid % 1024)
+    lid = lid >> 10
+
+    lighting_filter = (lid % 4)
+    lid = lid >> 2
+
+    flat = (lid % 2)
+    lid = lid >> 1
+
+    flip = (lid % 2)
+    lid = lid >> 1
+
+    tile_rotation = lid
+
+    print(f"Lid tile: {tile_texture_idx}")
+    #print(f"Tile rotation: {tile_rotation}°")
+    #print(f"Filter: {lighting_filter}")
+    #print(f"Flat: {flat}")
+    #print(f"Flip: {flip}")
+
+def is_slope(block_data):
+    slope_byte = block_data[-1]
+    slope_byte = slope_byte >> 2
+    if (slope_byte == 0):
+        return False
+    if (slope_byte > 60):
+        return False
+    return True
+
+def print_all_info_block_data(block_data):
+    left_side = int.from_bytes(block_data[0:2], 'little')
+    right_side = int.from_bytes(block_data[2:4], 'little')
+    top_side = int.from_bytes(block_data[4:6], 'little')
+    bottom_side = int.from_bytes(block_data[6:8], 'little')
+    lid = int.from_bytes(block_data[8:10], 'little')
+
+    #print("Left side info:")
+    read_block_side_info(left_side, "Left")
+
+    #print("\nRight side info:")
+    read_block_side_info(right_side, "Right")
+
+    #print("\nTop side info:")
+    read_block_side_info(top_side, "Top")
+
+    #print("\nBottom side info:")
+    read_block_side_info(bottom_side, "Bottom")
+
+    #print("\nLid info:")
+    read_lid_info(lid)
+
+def fix_psx_slope(block_data):
+    slope_byte = block_data[-1]
+    slope_type = slope_byte >> 2
+    if (49 <= slope_type <= 52):
+        lid = int.from_bytes(block_data[8:10], 'little')
+        tile_texture_idx = (lid % 1024)
+        if tile_texture_idx == 384:
+            tile_texture_idx = 1023
+            lid = lid | tile_texture_idx    # set all lowest 10 bits to 1  (1111 1111 11 = 1023)
+            new_block_data = block_data[:8] + bytes([lid % 256, lid // 256]) + block_data[10:]
+        else:
+            new_block_data = block_data     # do nothing
+    else:
+        new_block_data = block_data     # do nothing
+    return new_block_data
+
+def pad_psx_chunk(chunk_data):
+    """Append the 0xAA terminator run of a PSX chunk: at least one byte, up to the next dword boundary."""
+    num_terminators = 4 - len(chunk_data) % 4
+    return chunk_data + bytes([CHUNK_PADDING_BYTE])*num_terminators
+
+def read_gmp_file(gmp_path):
+    """Read the whole gmp file into a single buffer with one read call."""
+    with open(gmp_path, 'rb') as file:
+        return file.read()
+
+def read_gmp_file_stat(gmp_path):
+    """Read the whole gmp file like read_gmp_file and also return the stat of the file that was read."""
+    with open(gmp_path, 'rb') as file:
+        gmp_stat = os.fstat(file.fileno())
+        return file.read(), gmp_stat
+
+############ Chunk index
+
+def count_chunk_padding(gmp_data, offset):
+    """Return the length of the 0xAA run starting at offset."""
+    non_padding = NON_PADDING_PATTERN.search(gmp_data, offset)
+    if non_padding is None:
+        return len(gmp_data) - offset
+    return non_padding.start() - offset
+
+def scan_psx_chunks(gmp_data):
+    """Locate the CMAP, ZONE, ANIM and RGEN chunks and the CMAP sections of a PSX gmp buffer."""
+    size = len(gmp_data)
+
+    chunks = []
+    cmap_fields = dict(column_start = None, 
+                       column_words = None,
+                       block_info_1_start = None, 
+                       num_complete_blocks = None,
+                       block_info_2_start = None,
+                       num_lid_blocks_only = None)
+
+    current_offset = 0
+
+    while (current_offset < size):
+        chunk_header = bytes(gmp_data[current_offset:current_offset+4])
+        if chunk_header not in PSX_CHUNK_HEADERS:
+            current_offset += 4
+            continue
+
+        chunk_name = chunk_header.decode('ascii')
+        header_data_offset = current_offset + 8
+
+        if header_data_offset > size:
+            raise PsxTruncatedMapError(f"{chunk_name} chunk header at {hex(current_offset)} is cut by the end of the file")
+
+        if chunk_name == "CMAP":
+            # the header size is fake, walk the CMAP sections
+            offset = header_data_offset + CMAP_DATA_SIZE
+            column_words = int.from_bytes(gmp_data[offset:offset+2], 'little')
+            offset += 2
+
+            cmap_fields["column_words"] = column_words
+            cmap_fields["column_start"] = offset
+
+            # skip column data and the first padding: go to first block info section
+            offset += 2*column_words + FIRST_CMAP_PADDING_SIZE
+
+            cmap_fields["block_info_1_start"] = offset
+            num_complete_blocks = int.from_bytes(gmp_data[offset:offset+2], 'little')    # number of blocks with non-null sides
+            cmap_fields["num_complete_blocks"] = num_complete_blocks
+
+            # skip first block info data section
+            offset += 2 + num_complete_blocks*BLOCK_INFO_SIZE + SECOND_CMAP_PADDING_SIZE
+
+            cmap_fields["block_info_2_start"] = offset
+            num_lid_blocks_only = int.from_bytes(gmp_data[offset:offset+2], 'little')    # number of blocks with only lid, arrow & slope data
+            cmap_fields["num_lid_blocks_only"] = num_lid_blocks_only
+
+            # skip second block info data section
+            data_end_offset = offset + 2 + num_lid_blocks_only*4
+
+        else:   # chunk_name == "ZONE" or chunk_name == "ANIM" or chunk_name == "RGEN"
+            data_size = int.from_bytes(gmp_data[current_offset+4:header_data_offset], 'little')
+            data_end_offset = header_data_offset + data_size
+
+        if data_end_offset > size:
+            raise PsxTruncatedMapError(f"{chunk_name} chunk at {hex(current_offset)} ends at {hex(data_end_offset)}, "
+                                       f"past the end of the file ({hex(size)})")
+
+        if chunk_name == "RGEN":
+            # no padding, but the data goes on for 2 bytes after its size
+            num_terminators = 0
+            end_offset = data_end_offset + 2
+        else:
+            num_terminators = count_chunk_padding(gmp_data, data_end_offset)
+            if num_terminators == 0:
+                raise PsxChunkSizeError(f"Wrong {chunk_name} size: no {hex(CHUNK_PADDING_BYTE)} padding "
+                                        f"after its data at {hex(data_end_offset)}")
+            end_offset = data_end_offset + num_terminators
+
+        chunks.append(PsxChunk(chunk_name, current_offset, header_data_offset, 
+                               end_offset - header_data_offset - num_terminators, num_terminators))
+
+        current_offset = end_offset
+
+    if not any( chunk.name == "CMAP" for chunk in chunks ):
+        raise PsxMissingChunkError("No CMAP chunk found")
+
+    return PsxChunkIndex(size, tuple(chunks), **cmap_fields)
+
+def get_chunk_index_cache_path(gmp_path):
+    gmp_path = Path(gmp_path)
+    return gmp_path.with_name(gmp_path.name + CHUNK_INDEX_CACHE_SUFFIX)
+
+def load_chunk_index(gmp_path, gmp_data, gmp_stat):
+    """Return the chunk index of a map, from the cache file next to it when its size and mtime still match.
+
+    gmp_stat must be the stat of the file gmp_data was read from (see
+    read_gmp_file_stat), so a map replaced after it was read can't be
+    matched with the index of the new file. A missing or stale cache gets
+    rewritten after scanning gmp_data."""
+    cache_key = dict(file_size = gmp_stat.st_size, mtime_ns = gmp_stat.st_mtime_ns)
+    cache_path = get_chunk_index_cache_path(gmp_path)
+
+    try:
+        with open(cache_path, 'r') as file:
+            cached = json.load(file)
+        if cached["key"] == cache_key and cached["index"]["file_size"] == len(gmp_data):
+            index_fields = cached["index"]
+            index_fields["chunks"] = tuple( PsxChunk(*chunk) for chunk in index_fields["chunks"] )
+            return PsxChunkIndex(**index_fields)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    chunk_index = scan_psx_chunks(gmp_data)
+
+    try:
+        with open(cache_path, 'w') as file:
+            json.dump(dict(key = cache_key, index = chunk_index._asdict()), file)
+    except OSError:
+        pass    # read only map folder, just don't cache
+
+    return chunk_index
+
+def get_chunk_infos(chunk_index):
+    """Return the chunk offset/size and CMAP section dicts of a chunk index."""
+    psx_chunk_info = dict(CMAP = [None, None], 
+                   ZONE = [None, None], 
+                   ANIM = [None, None],
+                   RGEN = [None, None])
+
+    cmap_info =  dict(column_start = chunk_index.column_start, 
+                   block_info_1_start = chunk_index.block_info_1_start, 
+                   block_info_2_start = chunk_index.block_info_2_start,
+                   column_words = chunk_index.column_words,
+                   num_complete_blocks = chunk_index.num_complete_blocks,
+                   num_lid_blocks_only = chunk_index.num_lid_blocks_only)
+
+    for chunk in chunk_index.chunks:
+        psx_chunk_info[chunk.name] = [chunk.data_offset, chunk.size]
+
+    return ( psx_chunk_info, cmap_info )
+
+def check_required_chunks(chunk_infos):
+    """Raise PsxMissingChunkError if the ZONE or ANIM chunk every PC map needs isn't in the map."""
+    missing_chunks = [ chunk_name for chunk_name in ("ZONE", "ANIM") if chunk_infos[chunk_name][0] is None ]
+    if missing_chunks:
+        raise PsxMissingChunkError(f"No {' and '.join(missing_chunks)} chunk found")
+
+def read_psx_map(gmp_data, chunk_index=None):
+
+    if chunk_index is None:
+        chunk_index = scan_psx_chunks(gmp_data)
+
+    print("File Size: {:,} bytes".format(chunk_index.file_size))
+
+    for chunk in chunk_index.chunks:
+        print(f"Header {chunk.name} found! Offset: {hex(chunk.data_offset)}, Size: {hex(chunk.size + chunk.padding)}")
+
+    print("")
+    return get_chunk_infos(chunk_index)
+
+def get_psx_map_views(gmp_data, chunk_infos, cmap_info):
+    """Slice the map buffer into zero-copy views of the CMAP tables and the other chunks."""
+    data = memoryview(gmp_data)
+
+    cmap_offset = chunk_infos["CMAP"][0]
+    column_start = cmap_info["column_start"]
+    block_info_1_start = cmap_info["block_info_1_start"] + 2
+    block_info_2_start = cmap_info["block_info_2_start"] + 2
+
+    psx_views = dict(base_table = data[cmap_offset : cmap_offset + CMAP_DATA_SIZE],
+                     columns = data[column_start : column_start + 2*cmap_info["column_words"]],
+                     complete_blocks = data[block_info_1_start : block_info_1_start + BLOCK_INFO_SIZE*cmap_info["num_complete_blocks"]],
+                     lid_blocks = data[block_info_2_start : block_info_2_start + 4*cmap_info["num_lid_blocks_only"]])
+
+    for chunk_header in ("ZONE", "ANIM", "RGEN"):
+        chunk_offset, size = chunk_infos[chunk_header]
+        if chunk_offset is None:
+            psx_views[chunk_header] = None
+        else:
+            psx_views[chunk_header] = data[chunk_offset : chunk_offset + size]
+
+    return psx_views
+
+############ CMAP stuff
+
+def CMAP_read_all_columns(gmp_data, chunk_infos):
+    
+    dmap_offset = chunk_infos["CMAP"][0]
+    size = chunk_infos["CMAP"][1]
+
+    offset = dmap_offset + CMAP_DATA_SIZE
+    column_words = int.from_bytes(gmp_data[offset:offset+2], 'little')
+    offset += 2
+
+    print(f"Num of columns words: {column_words}")
+
+    words = 0
+    column_idx = 0
+
+    while (words < column_words):
+        start_offset = offset
+
+        column_height = gmp_data[offset]
+        column_offset = gmp_data[offset+1]
+        num_blocks = column_height - column_offset
+        
+        # same bounds as decode_psx_column and validate_psx_map: a column can fill all the map levels
+        if column_height > MAP_MAX_Z+1:
+            raise PsxCorruptMapError(f"Height {column_height} above {MAP_MAX_Z+1}. Column {column_idx} "
+                                     f"at offset {hex(start_offset)}, words count = {words}")
+
+        if column_offset > MAP_MAX_Z:
+            raise PsxCorruptMapError(f"BlockOffset {column_offset} above {MAP_MAX_Z}. Column {column_idx} "
+                                     f"at offset {hex(start_offset)}, words count = {words}")
+
+        # 1 for height, 1 for offset, 2*num_blocks for blockd
+        column_size = 1 + 1 + 2*num_blocks
+
+        if column_size < 0:
+            raise PsxCorruptMapError(f"Negative column_size: {column_size}. Column: {column_idx}, Height = {column_height}, "
+                                     f"Block Offset = {column_offset}, File Offset: {hex(start_offset)}")
+
+        offset += column_size
+
+        words += column_size // 2
+        column_idx += 1
+    
+    print(f"Number of columns: {column_idx}")
+
+    column_finish_offset = offset
+    print(f"Column data start offset: {hex(dmap_offset + CMAP_DATA_SIZE + 2)}")
+    print(f"Column data finish offset: {hex(column_finish_offset)}")
+
+    block_data_info_offset = column_finish_offset + 1024 # TODO: psx vs pc CMAP: include 1024 (padding?)
+    
+    num_total_blocks = int.from_bytes(gmp_data[block_data_info_offset:block_data_info_offset+2], 'little')
+    print(f"Num unique blocks: {num_total_blocks}")
+
+    block_data_finish_offset = block_data_info_offset + num_total_blocks*BLOCK_INFO_SIZE
+
+    print(f"Block info start offset = {hex(block_data_info_offset)}")
+    print(f"Block info end offset = {hex(block_data_finish_offset)}")
+
+    return block_data_info_offset + 2, block_data_finish_offset, num_total_blocks
+
+def decode_psx_column(psx_views, words_offset):
+    """Decode the column at a word offset into its z offset and a tuple of its final 12-byte blocks.
+
+    Raises PsxCorruptMapError if the column or its block ids point outside
+    the map data."""
+    columns = psx_views["columns"]
+    complete_blocks = psx_views["complete_blocks"]
+    lid_blocks = psx_views["lid_blocks"]
+
+    tgt_column_offset = 2*words_offset
+    if tgt_column_offset + 2 > len(columns):
+        raise PsxCorruptMapError(f"Column word offset {words_offset} is past the {len(columns) // 2} column words")
+
+    column_height = columns[tgt_column_offset]
+    column_offset = columns[tgt_column_offset+1]
+    num_blocks = column_height - column_offset
+
+    if column_height > MAP_MAX_Z+1 or num_blocks < 0:
+        raise PsxCorruptMapError(f"Column at word {words_offset} has height {column_height} and offset {column_offset}")
+    if tgt_column_offset + 2 + 2*num_blocks > len(columns):
+        raise PsxCorruptMapError(f"Column at word {words_offset} goes past the end of the column words")
+
+    column_blocks = []
+
+    for block_idx in range(num_blocks):
+        block_id_offset = tgt_column_offset + 2 + 2*block_idx
+        block_id = int.from_bytes( columns[block_id_offset:block_id_offset+2], 'little' )
+
+        if (block_id < 32768):
+            block_info_offset = BLOCK_INFO_SIZE*block_id
+            if block_info_offset + BLOCK_INFO_SIZE > len(complete_blocks):
+                raise PsxCorruptMapError(f"Column at word {words_offset} uses complete block {block_id}, "
+                                         f"the map has {len(complete_blocks) // BLOCK_INFO_SIZE}")
+            block_data = bytes(complete_blocks[block_info_offset:block_info_offset+BLOCK_INFO_SIZE])
+
+            # now fix tile 384 to 1023 for 3-sided slopes
+            if is_slope(block_data):
+                block_data = fix_psx_slope(block_data)
+        else:
+            block_info_offset = 4*(block_id - 32768)
+            if block_info_offset + 4 > len(lid_blocks):
+                raise PsxCorruptMapError(f"Column at word {words_offset} uses lid only block {block_id - 32768}, "
+                                         f"the map has {len(lid_blocks) // 4}")
+            lid_slope_data = bytes(lid_blocks[block_info_offset:block_info_offset+4])
+            block_data = bytes([0,0  ,  0,0  ,  0,0  ,  0,0 ]) + lid_slope_data
+
+        column_blocks.append(block_data)
+
+    return column_offset, tuple(column_blocks)
+
+def make_column_decoder(psx_views, maxsize=None):
+    """Return a memoized decode_psx_column for this map.
+    
+    Columns shared by several cells are decoded only once, cache_info() 
+    reports the hits and misses."""
+    @lru_cache(maxsize=maxsize)
+    def decode_column(words_offset):
+        return decode_psx_column(psx_views, words_offset)
+
+    return decode_column
+
+def PSX_CMAP_decompress(psx_views, decode_column=None):
+    # initialize block info array with empty blocks
+    empty_block_data = bytes([0 for _ in range(BLOCK_INFO_SIZE)])
+    block_info_array = [ [ [empty_block_data for _ in range(MAP_WIDTH+1)] for _ in range(MAP_HEIGHT+1) ] for _ in range(MAP_MAX_Z+1) ]
+
+    if decode_column is None:
+        decode_column = make_column_decoder(psx_views)
+
+    base_table = psx_views["base_table"]
+
+    for y in range(MAP_HEIGHT+1):
+        for x in range(MAP_WIDTH+1):
+            base_offset = 2*(x + y*256)
+            words_offset = int.from_bytes(base_table[base_offset:base_offset+2], 'little')
+
+            column_offset, column_blocks = decode_column(words_offset)
+
+            for blockd_idx, block_data in enumerate(column_blocks):
+                z = column_offset + blockd_idx
+                block_info_array[z][y][x] = block_data
+
+    return block_info_array
+
+def read_words(data):
+    """Return the little endian words of a buffer as an array of unsigned shorts."""
+    words = array('H')
+    words.frombytes(data)
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words
+
+def get_cell_stacks(psx_views, decode_column=None):
+    """Return the full z stack of the column of every cell, in base table order.
+
+    Every distinct column is expanded into its z stack only once, cells 
+    sharing a column share the same stack."""
+    if decode_column is None:
+        decode_column = make_column_decoder(psx_views)
+
+    base_table = read_words(psx_views["base_table"])
+
+    column_stacks = {}
+    for words_offset in base_table:
+        column_offset, column_blocks = decode_column(words_offset)
+        if words_offset in column_stacks:
+            continue
+
+        column_stack = [EMPTY_BLOCK_DATA]*(MAP_MAX_Z+1)
+        column_stack[column_offset : column_offset + len(column_blocks)] = column_blocks
+        column_stacks[words_offset] = column_stack
+
+    return [ column_stacks[words_offset] for words_offset in base_table ]
+
+def iter_umap_rows(cell_stacks):
+    """Yield the 256 blocks of each (y, z) row in UMAP order.
+
+    Each row is built with a single join, so only one row is alive at a time."""
+    row_stacks = [ cell_stacks[y*256 : (y+1)*256] for y in range(MAP_HEIGHT+1) ]
+
+    for z in range(MAP_MAX_Z+1):
+        block_getter = itemgetter(z)
+        for row_stack in row_stacks:
+            yield b"".join(map(block_getter, row_stack))
+
+def PSX_CMAP_decompress_volume(psx_views, decode_column=None):
+    """Decode the CMAP into one contiguous UMAP volume laid out as [z][y][x][12] bytes.
+
+    Produces the same bytes as flattening the PSX_CMAP_decompress output."""
+    return b"".join(iter_umap_rows(get_cell_stacks(psx_views, decode_column)))
+
+def flatten_block_info_array(block_info_array):
+    """Join a [z][y][x] block info array into the contiguous UMAP volume."""
+    return b"".join( b"".join(row) for plane in block_info_array for row in plane )
+
+def get_gmp_zones(psx_views):
+    return ZoneTable(psx_views["ZONE"])
+
+def get_gmp_anims(psx_views):
+    return AnimTable(psx_views["ANIM"])
+
+############ Zones
+
+ZONE_INDEX_CELL_SIZE = 16   # size in blocks of the square cells of the zone spatial index
+ZONE_INDEX_WIDTH = (MAP_WIDTH+1) // ZONE_INDEX_CELL_SIZE
+
+Zone = namedtuple("Zone", ["type", "x", "y", "w", "h", "name"])
+
+class ZoneTable:
+    """Columnar view of a ZONE chunk (the same in PSX and PC maps).
+
+    The zone types and coordinates are kept as one byte string each, the
+    names as offsets and lengths into the original buffer. Zones can be
+    looked up by name and by the point they contain."""
+
+    def __init__(self, zone_data):
+        self.data = zone_data
+        size = len(zone_data)
+
+        # only the records start offsets need a walk, the fields are gathered afterwards
+        zone_offsets = array('I')
+        current_offset = 0
+        while (current_offset < size):
+            if current_offset + ZONE_TYPE_COORDS_DATA_SIZE + 1 > size:
+                raise PsxMapError(f"ZONE chunk: zone {len(zone_offsets)} at {hex(current_offset)} is cut by the end of the chunk")
+            zone_offsets.append(current_offset)
+            current_offset += ZONE_TYPE_COORDS_DATA_SIZE + 1 + zone_data[current_offset + ZONE_TYPE_COORDS_DATA_SIZE]
+
+        if current_offset > size:
+            raise PsxMapError(f"ZONE chunk: the name of zone {len(zone_offsets) - 1} goes past the end of the chunk")
+
+        self.types = self.gather_bytes(zone_offsets, 0)
+        self.xs = self.gather_bytes(zone_offsets, 1)
+        self.ys = self.gather_bytes(zone_offsets, 2)
+        self.widths = self.gather_bytes(zone_offsets, 3)
+        self.heights = self.gather_bytes(zone_offsets, 4)
+        self.name_lengths = self.gather_bytes(zone_offsets, ZONE_TYPE_COORDS_DATA_SIZE)
+        self.name_offsets = array('I', [ zone_offset + ZONE_TYPE_COORDS_DATA_SIZE + 1 for zone_offset in zone_offsets ])
+
+        # zone names are unique in the original maps, a repeated name keeps its first zone
+        self.name_index = {}
+        for zone_idx in range(len(zone_offsets)):
+            self.name_index.setdefault(self.name(zone_idx), zone_idx)
+
+        self.build_spatial_index()
+
+    def gather_bytes(self, zone_offsets, field_offset):
+        if not zone_offsets:
+            return b""
+        if len(zone_offsets) == 1:
+            return bytes([ self.data[zone_offsets[0] + field_offset] ])
+        return bytes(itemgetter(*[ zone_offset + field_offset for zone_offset in zone_offsets ])(self.data))
+
+    def build_spatial_index(self):
+        """Put every zone in the index cells it overlaps.
+
+        A cell whose zones all cover it completely keeps its answer, so the
+        point queries there don't need any rectangle test."""
+        cell_candidates = [ [] for _ in range(ZONE_INDEX_WIDTH*ZONE_INDEX_WIDTH) ]
+        for zone_idx, (x, y, w, h) in enumerate(zip(self.xs, self.ys, self.widths, self.heights)):
+            x_end = min(x + w, MAP_WIDTH+1)
+            y_end = min(y + h, MAP_HEIGHT+1)
+            if x_end <= x or y_end <= y:
+                continue
+            zone_rect = (zone_idx, x, y, x_end, y_end)
+            for cell_y in range(y // ZONE_INDEX_CELL_SIZE, (y_end - 1) // ZONE_INDEX_CELL_SIZE + 1):
+                for cell_x in range(x // ZONE_INDEX_CELL_SIZE, (x_end - 1) // ZONE_INDEX_CELL_SIZE + 1):
+                    cell_candidates[cell_y*ZONE_INDEX_WIDTH + cell_x].append(zone_rect)
+
+        self.index_cells = []
+        for cell_idx, candidates in enumerate(cell_candidates):
+            cell_y, cell_x = divmod(cell_idx, ZONE_INDEX_WIDTH)
+            cell_x0 = cell_x*ZONE_INDEX_CELL_SIZE
+            cell_y0 = cell_y*ZONE_INDEX_CELL_SIZE
+            cell_x1 = cell_x0 + ZONE_INDEX_CELL_SIZE
+            cell_y1 = cell_y0 + ZONE_INDEX_CELL_SIZE
+            covers_cell = all( x <= cell_x0 and y <= cell_y0 and x_end >= cell_x1 and y_end >= cell_y1
+                               for _, x, y, x_end, y_end in candidates )
+            if covers_cell:
+                self.index_cells.append( (tuple( zone_rect[0] for zone_rect in candidates ), None) )
+            else:
+                self.index_cells.append( (None, tuple(candidates)) )
+
+    def __len__(self):
+        return len(self.types)
+
+    def name(self, zone_idx):
+        name_offset = self.name_offsets[zone_idx]
+        return bytes(self.data[name_offset : name_offset + self.name_lengths[zone_idx]]).decode('latin-1')
+
+    def zone(self, zone_idx):
+        return Zone(self.types[zone_idx], self.xs[zone_idx], self.ys[zone_idx],
+                    self.widths[zone_idx], self.heights[zone_idx], self.name(zone_idx))
+
+    def find(self, name):
+        """Return the index of the zone with this name, or None."""
+        return self.name_index.get(name)
+
+    def zones_at(self, x, y):
+        """Return the indexes of the zones containing the block (x, y), in chunk order."""
+        x = int(x)
+        y = int(y)
+        if not (0 <= x <= MAP_WIDTH and 0 <= y <= MAP_HEIGHT):
+            return ()
+        zone_idxs, candidates = self.index_cells[(y // ZONE_INDEX_CELL_SIZE)*ZONE_INDEX_WIDTH + x // ZONE_INDEX_CELL_SIZE]
+        if zone_idxs is not None:
+            return zone_idxs
+        return tuple( zone_idx for zone_idx, zone_x, zone_y, x_end, y_end in candidates
+                      if zone_x <= x < x_end and zone_y <= y < y_end )
+
+    def __iter__(self):
+        for zone_idx in range(len(self)):
+            yield self.zone(zone_idx)
+
+############ Tile animations
+
+# size of the fixed part of an ANIM record: base tile word, frame rate, repeat, length and unused bytes
+ANIM_HEADER_WORDS = 3
+
+Anim = namedtuple("Anim", ["base", "frame_rate", "repeat", "frames"])
+
+class AnimTable:
+    """Columnar view of an ANIM chunk (the same in PSX and PC maps).
+
+    Each record is the animated base tile, its frame rate (game frames per
+    animation frame), its repeat count (0 is forever) and the tiles of its
+    frames. The chunk is unpacked as words once, the per record fields and
+    the frames of all the animations are then gathered into arrays."""
+
+    def __init__(self, anim_data):
+        self.data = anim_data
+        if len(anim_data) % 2:
+            raise PsxMapError(f"ANIM chunk size {len(anim_data)} isn't a whole number of words")
+
+        words = read_words(anim_data)
+        num_words = len(words)
+
+        anim_offsets = []
+        current_offset = 0
+        while (current_offset < num_words):
+            if current_offset + ANIM_HEADER_WORDS > num_words:
+                raise PsxMapError(f"ANIM chunk: animation {len(anim_offsets)} at {hex(2*current_offset)} is cut by the end of the chunk")
+            anim_offsets.append(current_offset)
+            current_offset += ANIM_HEADER_WORDS + (words[current_offset + 2] & 0xFF)
+
+        if current_offset > num_words:
+            raise PsxMapError(f"ANIM chunk: the frames of animation {len(anim_offsets) - 1} go past the end of the chunk")
+
+        self.bases = array('H', [ words[anim_offset] for anim_offset in anim_offsets ])
+        self.frame_rates = bytes( words[anim_offset + 1] & 0xFF for anim_offset in anim_offsets )
+        self.repeats = bytes( words[anim_offset + 1] >> 8 for anim_offset in anim_offsets )
+        self.lengths = bytes( words[anim_offset + 2] & 0xFF for anim_offset in anim_offsets )
+
+        # frames of animation i are frames[frame_starts[i] : frame_starts[i] + lengths[i]]
+        self.frames = array('H')
+        self.frame_starts = array('I')
+        for anim_offset, anim_length in zip(anim_offsets, self.lengths):
+            self.frame_starts.append(len(self.frames))
+            self.frames.extend(words[anim_offset + ANIM_HEADER_WORDS : anim_offset + ANIM_HEADER_WORDS + anim_length])
+
+    def __len__(self):
+        return len(self.bases)
+
+    def anim_frames(self, anim_idx):
+        frame_start = self.frame_starts[anim_idx]
+        return self.frames[frame_start : frame_start + self.lengths[anim_idx]]
+
+    def anim(self, anim_idx):
+        return Anim(self.bases[anim_idx], self.frame_rates[anim_idx], self.repeats[anim_idx],
+                    tuple(self.anim_frames(anim_idx)))
+
+    def __iter__(self):
+        for anim_idx in range(len(self)):
+            yield self.anim(anim_idx)
+
+def get_gmp_rgen(psx_views):
+    """Return the RGEN data within its declared size, or None if the map has no RGEN.
+
+    Its layout isn't documented, so it isn't parsed and it's only written
+    to the PC map when asked for (--rgen), unchanged and with the same
+    declared size. The 2 bytes the PSX RGEN has after its size are left out."""
+    rgen_data = psx_views["RGEN"]
+    if rgen_data is None:
+        return None
+    return rgen_data[:len(rgen_data) - 2]
+
+############ Block fields
+
+# (field, first bit, number of bits) of the flags in the high byte of the side and lid words,
+# the two lowest bits of the high byte are the top of the 10-bit tile index
+SIDE_FLAG_FIELDS = ( ("wall", 2, 1), ("bullet_wall", 3, 1), ("flat", 4, 1), ("flip", 5, 1), ("rotation", 6, 2) )
+LID_FLAG_FIELDS = ( ("lighting_filter", 2, 2), ("flat", 4, 1), ("flip", 5, 1), ("rotation", 6, 2) )
+
+BLOCK_FACES = ( ("left", 0, SIDE_FLAG_FIELDS),
+                ("right", 2, SIDE_FLAG_FIELDS),
+                ("top", 4, SIDE_FLAG_FIELDS),
+                ("bottom", 6, SIDE_FLAG_FIELDS),
+                ("lid", 8, LID_FLAG_FIELDS) )
+
+def byte_table(function):
+    """Return a bytes.translate table mapping every byte value through function."""
+    return bytes( function(value) & 0xFF for value in range(256) )
+
+def or_bytes(byte_strings, length):
+    """OR equally long byte strings together."""
+    result = 0
+    for data in byte_strings:
+        result |= int.from_bytes(data, 'little')
+    return result.to_bytes(length, 'little')
+
+def decode_block_fields(blocks_data):
+    """Split a buffer of 12-byte blocks (a block table or a whole UMAP) into one array per field.
+
+    Fields are <face>_tile (unsigned shorts) and <face>_<flag> (unsigned chars) 
+    for the left, right, top, bottom sides and the lid, plus arrows, 
+    ground_type and slope_type. The work is done with slicing and byte 
+    translation tables, not per block."""
+    blocks_data = bytes(blocks_data)
+    num_blocks = len(blocks_data) // BLOCK_INFO_SIZE
+    tile_high_table = byte_table(lambda value: value & 3)
+
+    fields = {}
+
+    for face_name, face_offset, flag_fields in BLOCK_FACES:
+        low_bytes = blocks_data[face_offset::BLOCK_INFO_SIZE]
+        high_bytes = blocks_data[face_offset+1::BLOCK_INFO_SIZE]
+
+        tile_data = bytearray(2*num_blocks)
+        tile_data[0::2] = low_bytes
+        tile_data[1::2] = high_bytes.translate(tile_high_table)
+        fields[f"{face_name}_tile"] = read_words(tile_data)
+
+        for flag_name, first_bit, num_bits in flag_fields:
+            mask = (1 << num_bits) - 1
+            flag_table = byte_table(lambda value: (value >> first_bit) & mask)
+            fields[f"{face_name}_{flag_name}"] = array('B', high_bytes.translate(flag_table))
+
+    fields["arrows"] = array('B', blocks_data[10::BLOCK_INFO_SIZE])
+    slope_bytes = blocks_data[11::BLOCK_INFO_SIZE]
+    fields["ground_type"] = array('B', slope_bytes.translate(byte_table(lambda value: value & 3)))
+    fields["slope_type"] = array('B', slope_bytes.translate(byte_table(lambda value: value >> 2)))
+
+    return fields
+
+def encode_block_fields(fields):
+    """Pack the field arrays of decode_block_fields back into a buffer of 12-byte blocks."""
+    num_blocks = len(fields["arrows"])
+    blocks_data = bytearray(BLOCK_INFO_SIZE*num_blocks)
+    tile_high_table = byte_table(lambda value: value & 3)
+
+    for face_name, face_offset, flag_fields in BLOCK_FACES:
+        tile_data = words_to_bytes(array('H', fields[f"{face_name}_tile"]))
+        high_parts = [ tile_data[1::2].translate(tile_high_table) ]
+
+        for flag_name, first_bit, num_bits in flag_fields:
+            mask = (1 << num_bits) - 1
+            flag_table = byte_table(lambda value: (value & mask) << first_bit)
+            high_parts.append(bytes(fields[f"{face_name}_{flag_name}"]).translate(flag_table))
+
+        blocks_data[face_offset::BLOCK_INFO_SIZE] = tile_data[0::2]
+        blocks_data[face_offset+1::BLOCK_INFO_SIZE] = or_bytes(high_parts, num_blocks)
+
+    blocks_data[10::BLOCK_INFO_SIZE] = bytes(fields["arrows"])
+    blocks_data[11::BLOCK_INFO_SIZE] = or_bytes([ bytes(fields["ground_type"]).translate(byte_table(lambda value: value & 3)),
+                                                  bytes(fields["slope_type"]).translate(byte_table(lambda value: value << 2)) ],
+                                                num_blocks)
+
+    return blocks_data
+
+############ PC compressed map
+
+def get_umap_data(block_info_array):
+    """Return the contiguous UMAP volume of a decoded map, whichever engine produced it."""
+    if isinstance(block_info_array, (bytes, bytearray, memoryview)):
+        return block_info_array
+    if isinstance(block_info_array, list):
+        return flatten_block_info_array(block_info_array)
+    return b"".join(block_info_array)   # iterator of UMAP rows
+
+def read_words_32(data):
+    """Return the little endian dwords of a buffer as an array of unsigned ints."""
+    words = array('I')
+    words.frombytes(data)
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words
+
+def words_to_bytes(words):
+    """Return the bytes of a word array in little endian."""
+    if sys.byteorder == 'big':
+        words = array(words.typecode, words)
+        words.byteswap()
+    return words.tobytes()
+
+def compress_umap(block_info_array):
+    """Deduplicate the columns and blocks of a decoded map.
+
+    Returns the base table with the index of the column of every cell, the 
+    list of unique columns as (height, offset, block ids) and the list of 
+    unique 12-byte blocks."""
+    umap_data = bytes(get_umap_data(block_info_array))
+    plane_size = BLOCK_INFO_SIZE*256*256
+
+    plane_blocks = []
+    for z in range(MAP_MAX_Z+1):
+        plane_start = z*plane_size
+        plane_blocks.append([ umap_data[i:i+BLOCK_INFO_SIZE] for i in range(plane_start, plane_start + plane_size, BLOCK_INFO_SIZE) ])
+
+    column_ids = {}
+    block_ids = {}
+    base_table = array('I')
+    columns = []
+    blocks = []
+
+    for column_stack in zip(*plane_blocks):
+        column_idx = column_ids.get(column_stack)
+        if column_idx is None:
+            non_empty_z = [ z for z, block_data in enumerate(column_stack) if block_data != EMPTY_BLOCK_DATA ]
+            if non_empty_z:
+                column_offset = non_empty_z[0]
+                column_height = non_empty_z[-1] + 1
+            else:
+                column_offset = 0
+                column_height = 0
+
+            column_block_ids = []
+            for block_data in column_stack[column_offset:column_height]:
+                block_id = block_ids.get(block_data)
+                if block_id is None:
+                    block_id = len(blocks)
+                    block_ids[block_data] = block_id
+                    blocks.append(block_data)
+                column_block_ids.append(block_id)
+
+            column_idx = len(columns)
+            column_ids[column_stack] = column_idx
+            columns.append( (column_height, column_offset, column_block_ids) )
+
+        base_table.append(column_idx)
+
+    return base_table, columns, blocks
+
+def encode_compressed_map(block_info_array, map_format):
+    """Encode a decoded map as a PC DMAP (32-bit) or CMAP (16-bit) chunk body."""
+    base_table, columns, blocks = compress_umap(block_info_array)
+
+    # DMAP columns use dwords (height, offset and a 16-bit pad as first dword), CMAP columns words
+    if map_format == "dmap":
+        typecode = 'I'
+    else:
+        typecode = 'H'
+
+    # checked before the column words are built, a block id past 0xFFFF doesn't fit in them
+    num_column_words = sum( 1 + len(column_block_ids) for _, _, column_block_ids in columns )
+    if map_format == "cmap" and (num_column_words > 0xFFFF or len(blocks) > 0xFFFF):
+        raise CmapTooLargeError(f"Map too large for the 16-bit CMAP format ({num_column_words} column words, "
+                                f"{len(blocks)} blocks), use DMAP instead")
+
+    column_words = array(typecode)
+    column_word_offsets = []
+    for column_height, column_offset, column_block_ids in columns:
+        column_word_offsets.append(len(column_words))
+        column_words.append(column_height | (column_offset << 8))
+        column_words.extend(column_block_ids)
+
+    base_words = array(typecode, [ column_word_offsets[column_idx] for column_idx in base_table ])
+
+    return b"".join([ words_to_bytes(base_words),
+                      words_to_bytes(array(typecode, [len(column_words)])),
+                      words_to_bytes(column_words),
+                      words_to_bytes(array(typecode, [len(blocks)])),
+                      b"".join(blocks) ])
+
+def read_edit_file(edit_file):
+    """Return the data of an edit file (relative paths are taken from the script folder), or None."""
+    if edit_file is None:
+        return None
+
+    edit_file_path = ROOT_DIR / edit_file
+    if not edit_file_path.exists():
+        print(f"Warning: {edit_file_path} don't exist!")
+        return None
+
+    with open(edit_file_path, 'rb') as file:
+        return file.read()
+
+def write_umap(file, block_info_array):
+    """Write the UMAP data from a buffer, a [z][y][x] array or an iterator of rows.
+
+    Rows are gathered into a preallocated z plane buffer, so the whole UMAP
+    takes 8 writes."""
+    if isinstance(block_info_array, (bytes, bytearray, memoryview)):
+        file.write(block_info_array)
+        return
+
+    if isinstance(block_info_array, list) and block_info_array and isinstance(block_info_array[0], list):
+        umap_rows = ( b"".join(row) for plane in block_info_array for row in plane )
+    else:
+        umap_rows = block_info_array
+
+    plane_buffer = bytearray(UMAP_PLANE_SIZE)
+    plane_view = memoryview(plane_buffer)   # a row of a wrong size raises instead of resizing the buffer
+    plane_offset = 0
+    for umap_row in umap_rows:
+        plane_view[plane_offset : plane_offset + UMAP_ROW_SIZE] = umap_row
+        plane_offset += UMAP_ROW_SIZE
+        if plane_offset == UMAP_PLANE_SIZE:
+            file.write(plane_buffer)
+            plane_offset = 0
+    if plane_offset:
+        file.write(plane_view[:plane_offset])
+
+def build_gmp_tail(zone_data, anim_data, rgen_data, edit_data):
+    """Assemble the ZONE, ANIM, RGEN and EDIT chunks of a PC gmp in one preallocated buffer."""
+    chunks = [ (b"ZONE", zone_data), (b"ANIM", anim_data) ]
+    if rgen_data is not None:
+        chunks.append( (b"RGEN", rgen_data) )
+
+    tail_size = sum( CHUNK_HEADER_STRUCT.size + len(chunk_data) for _, chunk_data in chunks )
+    if edit_data is not None:
+        tail_size += len(edit_data)
+
+    tail = bytearray(tail_size)
+    offset = 0
+    for chunk_name, chunk_data in chunks:
+        CHUNK_HEADER_STRUCT.pack_into(tail, offset, chunk_name, len(chunk_data))
+        offset += CHUNK_HEADER_STRUCT.size
+        tail[offset : offset + len(chunk_data)] = chunk_data
+        offset += len(chunk_data)
+
+    # the edit file already has its EDIT header
+    if edit_data is not None:
+        tail[offset:] = edit_data
+
+    return tail
+
+def write_gmp(file, block_info_array, zones_info_array, all_anim_data, chunk_info, edit_data, compression=None, rgen_data=None):
+    """Write a PC gmp to an open binary file.
+
+    The chunk sizes are taken from the data itself, chunk_info is only kept
+    for the callers."""
+    if isinstance(zones_info_array, ZoneTable):
+        zones_info_array = zones_info_array.data
+    elif not isinstance(zones_info_array, (bytes, bytearray, memoryview)):
+        zones_info_array = b"".join(zones_info_array)
+
+    if isinstance(all_anim_data, AnimTable):
+        all_anim_data = all_anim_data.data
+
+    if compression is not None:
+        # DMAP / CMAP
+        map_data = encode_compressed_map(block_info_array, compression)
+
+        file.write(GMP_HEADER_STRUCT.pack(b"GBMP", GMP_VERSION) +
+                   CHUNK_HEADER_STRUCT.pack(compression.upper().encode('ascii'), len(map_data)))
+        file.write(map_data)
+    else:
+        # UMAP
+        file.write(GMP_HEADER_STRUCT.pack(b"GBMP", GMP_VERSION) + CHUNK_HEADER_STRUCT.pack(b"UMAP", UMAP_SIZE))
+        write_umap(file, block_info_array)
+
+    # ZONE, ANIM, RGEN and EDIT
+    file.write(build_gmp_tail(zones_info_array, all_anim_data, rgen_data, edit_data))
+
+@contextlib.contextmanager
+def atomic_output(output_path):
+    """Open a temporary file next to output_path and rename it over output_path once written.
+
+    If the writing fails the temporary file is deleted, so output_path is
+    either the previous output or the complete new one, never half a map."""
+    output_path = Path(output_path)
+    temp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, 'wb') as file:
+            yield file
+        os.replace(temp_path, output_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+
+def create_gmp(output_path, block_info_array, zones_info_array, all_anim_data, chunk_info, edit_file, compression=None,
+               rgen_data=None):
+    edit_data = read_edit_file(edit_file)
+    with atomic_output(output_path) as file:
+        write_gmp(file, block_info_array, zones_info_array, all_anim_data, chunk_info, edit_data, compression, rgen_data)
+    return
+
+############ PC gmp reading
+
+def read_pc_map(gmp_data):
+    """Return the chunks of a PC gmp buffer as a dict of chunk name: memoryview of its data."""
+    data = memoryview(gmp_data)
+    if bytes(data[:4]) != b"GBMP":
+        raise PcMapError("Not a PC gmp file: missing GBMP signature")
+
+    pc_chunks = {}
+    offset = 4 + 2    # signature and version
+    while offset < len(data):
+        if offset + 8 > len(data):
+            raise PcMapError(f"Chunk header at {hex(offset)} is cut by the end of the file")
+        chunk_name = bytes(data[offset:offset+4]).decode('ascii', 'replace')
+        chunk_size = int.from_bytes(data[offset+4:offset+8], 'little')
+        data_offset = offset + 8
+        if data_offset + chunk_size > len(data):
+            raise PcMapError(f"{chunk_name} chunk at {hex(offset)} goes past the end of the file")
+
+        pc_chunks.setdefault(chunk_name, data[data_offset : data_offset + chunk_size])
+        offset = data_offset + chunk_size
+
+    return pc_chunks
+
+def decompress_pc_map(map_data, map_format):
+    """Decode a PC DMAP (32-bit) or CMAP (16-bit) chunk into the contiguous UMAP volume.
+
+    Raises PcMapError if a table, a column or a block id points outside
+    the chunk."""
+    chunk_name = map_format.upper()
+    if map_format == "dmap":
+        word_size = 4
+        read_map_words = read_words_32
+    else:
+        word_size = 2
+        read_map_words = read_words
+
+    base_end = word_size*256*256
+    if len(map_data) < base_end + word_size:
+        raise PcMapError(f"{chunk_name} chunk too small for its base table: {len(map_data)} bytes")
+    base_table = read_map_words(map_data[:base_end])
+    column_words_count = read_map_words(map_data[base_end : base_end + word_size])[0]
+    columns_start = base_end + word_size
+    columns_end = columns_start + word_size*column_words_count
+    blocks_start = columns_end + word_size
+    if blocks_start > len(map_data):
+        raise PcMapError(f"{chunk_name} chunk: {column_words_count} column words go past the end of the chunk")
+    column_words = read_map_words(map_data[columns_start:columns_end])
+    num_blocks = read_map_words(map_data[columns_end:blocks_start])[0]
+    blocks_data = bytes(map_data[blocks_start:])
+    if len(blocks_data) < BLOCK_INFO_SIZE*num_blocks:
+        raise PcMapError(f"{chunk_name} chunk: {num_blocks} blocks go past the end of the chunk")
+
+    column_stacks = {}
+    for words_offset in base_table:
+        if words_offset in column_stacks:
+            continue
+        if words_offset >= column_words_count:
+            raise PcMapError(f"{chunk_name} chunk: column word offset {words_offset} is past "
+                             f"the {column_words_count} column words")
+        column_header = column_words[words_offset]
+        column_height = column_header & 0xFF
+        column_offset = (column_header >> 8) & 0xFF
+        num_column_blocks = column_height - column_offset
+
+        if column_height > MAP_MAX_Z+1 or num_column_blocks < 0:
+            raise PcMapError(f"{chunk_name} chunk: column at word {words_offset} has height {column_height} "
+                             f"and offset {column_offset}")
+        if words_offset + 1 + num_column_blocks > column_words_count:
+            raise PcMapError(f"{chunk_name} chunk: column at word {words_offset} goes past the end of the column words")
+
+        column_stack = [EMPTY_BLOCK_DATA]*(MAP_MAX_Z+1)
+        block_ids = column_words[words_offset + 1 : words_offset + 1 + num_column_blocks]
+        for z, block_id in enumerate(block_ids, column_offset):
+            if block_id >= num_blocks:
+                raise PcMapError(f"{chunk_name} chunk: column at word {words_offset} uses block {block_id}, "
+                                 f"the map has {num_blocks}")
+            column_stack[z] = blocks_data[BLOCK_INFO_SIZE*block_id : BLOCK_INFO_SIZE*(block_id + 1)]
+        column_stacks[words_offset] = column_stack
+
+    return b"".join(iter_umap_rows([ column_stacks[words_offset] for words_offset in base_table ]))
+
+def get_pc_umap(pc_chunks):
+    """Return the UMAP volume of a PC map, decompressing its DMAP or CMAP when it has no UMAP."""
+    if "UMAP" in pc_chunks:
+        if len(pc_chunks["UMAP"]) != UMAP_SIZE:
+            raise PcMapError(f"UMAP chunk size {len(pc_chunks['UMAP'])} isn't {UMAP_SIZE}")
+        return pc_chunks["UMAP"]
+    if "DMAP" in pc_chunks:
+        return decompress_pc_map(pc_chunks["DMAP"], "dmap")
+    if "CMAP" in pc_chunks:
+        return decompress_pc_map(pc_chunks["CMAP"], "cmap")
+    raise PcMapError("No UMAP, DMAP or CMAP chunk found")
+
+############ Profiling
+
+def read_io_counters():
+    """Return the read/write syscall and byte counters of this process, None where the OS doesn't expose them."""
+    try:
+        with open("/proc/self/io", 'r') as file:
+            io_counters = dict( line.split(": ") for line in file.read().splitlines() )
+    except OSError:
+        return None
+    return dict(read_calls = int(io_counters["syscr"]),
+                write_calls = int(io_counters["syscw"]),
+                bytes_read = int(io_counters["rchar"]),
+                bytes_written = int(io_counters["wchar"]))
+
+def new_profile(trace_allocations=False):
+    """Return an empty profile report.
+
+    With trace_allocations, allocations are traced to report the peak of
+    every stage. Tracing slows the stages down several times, so their
+    times are then only meaningful relative to each other."""
+    if trace_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    # reading the counters costs some reads itself, measure it to leave it out of the stages
+    io_probe = None
+    io_before = read_io_counters()
+    if io_before is not None:
+        io_after = read_io_counters()
+        io_probe = { counter: io_after[counter] - io_before[counter] for counter in io_before }
+
+    return dict(stages = {}, io_probe = io_probe, allocation_tracing = trace_allocations)
+
+@contextlib.contextmanager
+def profile_stage(profile, stage_name):
+    """Record the wall time, IO counters and allocation peak of a pipeline stage into a profile report.
+
+    Does nothing when profile is None."""
+    if profile is None:
+        yield
+        return
+
+    trace_allocations = profile["allocation_tracing"] and tracemalloc.is_tracing()
+    io_before = read_io_counters()
+    if trace_allocations:
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage = dict(time = time.perf_counter() - start_time)
+
+        io_after = read_io_counters()
+        if io_before is not None and io_after is not None:
+            for counter in io_before:
+                stage[counter] = max(io_after[counter] - io_before[counter] - profile["io_probe"][counter], 0)
+
+        if trace_allocations:
+            stage["allocation_peak"] = tracemalloc.get_traced_memory()[1] - memory_before
+
+        profile["stages"][stage_name] = stage
+
+def get_block_id_stats(psx_views):
+    """Count the block ids placed in the map, below 32768 (complete blocks) and above (lid only blocks)."""
+    base_table = read_words(psx_views["base_table"])
+    column_words = read_words(psx_views["columns"])
+
+    stats = dict(distinct_columns = 0,
+                 complete_blocks = 0,
+                 lid_only_blocks = 0,
+                 max_complete_block_id = None,
+                 min_lid_only_block_id = None,
+                 max_lid_only_block_id = None)
+
+    for words_offset, num_cells in Counter(base_table).items():
+        stats["distinct_columns"] += 1
+
+        column_header = column_words[words_offset]
+        num_blocks = (column_header & 0xFF) - (column_header >> 8)
+        block_ids = column_words[words_offset + 1 : words_offset + 1 + max(num_blocks, 0)]
+
+        for block_id in block_ids:
+            if block_id >= 32768:
+                stats["lid_only_blocks"] += num_cells
+                if stats["min_lid_only_block_id"] is None or block_id < stats["min_lid_only_block_id"]:
+                    stats["min_lid_only_block_id"] = block_id
+                if stats["max_lid_only_block_id"] is None or block_id > stats["max_lid_only_block_id"]:
+                    stats["max_lid_only_block_id"] = block_id
+            else:
+                stats["complete_blocks"] += num_cells
+                if stats["max_complete_block_id"] is None or block_id > stats["max_complete_block_id"]:
+                    stats["max_complete_block_id"] = block_id
+
+    return stats
+
+def write_profile(profile, profile_path):
+    with open(profile_path, 'w') as file:
+        json.dump(profile, file, indent=2)
+
+############ Conversion
+
+def convert_psx_file(psx_gmp_path, output_path, edit_file=None, engine="volume", compare_engines=False, compression=None,
+                     profile=None, index_cache=False, rgen=False):
+    print(f"\nOpening file {psx_gmp_path}...\n")
+    with profile_stage(profile, "read"):
+        gmp_data, gmp_stat = read_gmp_file_stat(psx_gmp_path)
+        edit_data = read_edit_file(edit_file)
+
+    with profile_stage(profile, "parse"):
+        if index_cache:
+            chunk_index = load_chunk_index(psx_gmp_path, gmp_data, gmp_stat)
+        else:
+            chunk_index = scan_psx_chunks(gmp_data)
+        chunk_infos, cmap_info = read_psx_map(gmp_data, chunk_index)
+        check_required_chunks(chunk_infos)
+        psx_views = get_psx_map_views(gmp_data, chunk_infos, cmap_info)
+
+    print("Column start offset: {}".format(hex(cmap_info["column_start"])))
+    print("Complete block info start offset: {}".format(hex(cmap_info["block_info_1_start"])))
+    print("Lid only block info start offset: {}".format(hex(cmap_info["block_info_2_start"])))
+    print("Num of unique complete blocks: {}".format(cmap_info["num_complete_blocks"]))
+    print("Num of unique lid only blocks: {}".format(cmap_info["num_lid_blocks_only"]))
+
+    if compare_engines:
+        with profile_stage(profile, "compare_engines"):
+            reference_umap = flatten_block_info_array(PSX_CMAP_decompress(psx_views))
+            volume_umap = PSX_CMAP_decompress_volume(psx_views)
+
+        if reference_umap != volume_umap:
+            raise RuntimeError("CMAP engines produced different UMAP data")
+        print("CMAP engines produced identical UMAP data")
+
+    decode_column = make_column_decoder(psx_views)
+
+    with profile_stage(profile, "decompress"):
+        if engine == "reference":
+            block_info_array = PSX_CMAP_decompress(psx_views, decode_column)
+        else:
+            # the rows get joined while create_gmp writes them
+            block_info_array = iter_umap_rows(get_cell_stacks(psx_views, decode_column))
+
+    # ZONE, ANIM and RGEN (if asked for) are copied through from the map buffer
+    zones_info_array = psx_views["ZONE"]
+    all_anim_data = psx_views["ANIM"]
+    rgen_data = get_gmp_rgen(psx_views) if rgen else None
+
+    # now create the gmp file
+    print(f"Creating gmp file at {output_path}...")
+    with profile_stage(profile, "write"):
+        with atomic_output(output_path) as file:
+            write_gmp(file, block_info_array, zones_info_array, all_anim_data, chunk_infos, edit_data, compression, rgen_data)
+
+    column_cache_info = decode_column.cache_info()
+    print(f"Column cache: {column_cache_info.hits} hits, {column_cache_info.misses} misses")
+
+    if profile is not None:
+        profile["map"] = str(psx_gmp_path)
+        profile["output"] = str(output_path)
+        profile["input_size"] = len(gmp_data)
+        profile["output_size"] = os.path.getsize(output_path)
+        profile["engine"] = engine
+        profile["compression"] = compression
+        profile["total_time"] = sum( stage["time"] for stage in profile["stages"].values() )
+        profile["column_cache"] = dict(hits = column_cache_info.hits, misses = column_cache_info.misses)
+        profile["block_ids"] = get_block_id_stats(psx_views)
+
+############ In-memory API
+
+def convert_stream(psx_data, output_file, edit_data=None, compression=None, rgen=False):
+    """Convert a PSX gmp to a PC gmp written to output_file.
+
+    psx_data is either the bytes of the map or a readable binary file, 
+    output_file any writable binary file. Nothing is printed and nothing 
+    else is read or written: errors are raised (PsxMapError for a bad map), 
+    so it can run concurrently from several threads."""
+    if hasattr(psx_data, "read"):
+        psx_data = psx_data.read()
+
+    chunk_infos, cmap_info = get_chunk_infos(scan_psx_chunks(psx_data))
+    check_required_chunks(chunk_infos)
+
+    psx_views = get_psx_map_views(psx_data, chunk_infos, cmap_info)
+    block_info_array = iter_umap_rows(get_cell_stacks(psx_views))
+
+    write_gmp(output_file, block_info_array, psx_views["ZONE"], psx_views["ANIM"], chunk_infos, edit_data, compression,
+              get_gmp_rgen(psx_views) if rgen else None)
+
+def convert(psx_bytes, edit_bytes=None, compression=None, rgen=False):
+    """Convert the bytes of a PSX gmp to the bytes of a PC gmp, see convert_stream."""
+    output_file = io.BytesIO()
+    convert_stream(psx_bytes, output_file, edit_bytes, compression, rgen)
+    return output_file.getvalue()
+
+############ Random access
+
+class PsxMap:
+    """Random access to the blocks of a PSX map, decoding only the columns that get queried.
+
+    Decoded columns are kept in a bounded LRU cache, they get the same slope 
+    fix as in a full conversion."""
+
+    def __init__(self, gmp_data, column_cache_size=4096):
+        self.gmp_data = gmp_data
+        self.chunk_index = scan_psx_chunks(gmp_data)
+        self.chunk_infos, self.cmap_info = get_chunk_infos(self.chunk_index)
+        self.psx_views = get_psx_map_views(gmp_data, self.chunk_infos, self.cmap_info)
+        self.decode_column = make_column_decoder(self.psx_views, column_cache_size)
+
+    @classmethod
+    def from_file(cls, gmp_path, column_cache_size=4096):
+        return cls(read_gmp_file(gmp_path), column_cache_size)
+
+    def column_words_offset(self, x, y):
+        """Return the base table entry of (x, y): the word offset of its column."""
+        if not (0 <= x <= MAP_WIDTH and 0 <= y <= MAP_HEIGHT):
+            raise IndexError(f"({x}, {y}) is outside the map")
+        base_offset = 2*(x + y*256)
+        return int.from_bytes(self.psx_views["base_table"][base_offset:base_offset+2], 'little')
+
+    def column(self, x, y):
+        """Return the 8 blocks of the column at (x, y), from z = 0 up."""
+        column_offset, column_blocks = self.decode_column(self.column_words_offset(x, y))
+        column_stack = [EMPTY_BLOCK_DATA]*(MAP_MAX_Z+1)
+        column_stack[column_offset : column_offset + len(column_blocks)] = column_blocks
+        return column_stack[:MAP_MAX_Z+1]
+
+    def block(self, x, y, z):
+        """Return the 12-byte block info at (x, y, z)."""
+        if not 0 <= z <= MAP_MAX_Z:
+            raise IndexError(f"z {z} is outside the map")
+        column_offset, column_blocks = self.decode_column(self.column_words_offset(x, y))
+        if column_offset <= z < column_offset + len(column_blocks):
+            return column_blocks[z - column_offset]
+        return EMPTY_BLOCK_DATA
+
+    def plane(self, z):
+        """Return the 256x256 blocks of a z level in UMAP order."""
+        return b"".join( self.block(x, y, z) for y in range(MAP_HEIGHT+1) for x in range(MAP_WIDTH+1) )
+
+    def cache_info(self):
+        return self.decode_column.cache_info()
+
+############ Region extraction
+
+# inclusive block bounds of a part of the map
+Region = namedtuple("Region", ["x0", "y0", "x1", "y1", "z0", "z1"])
+
+def parse_region(region_text):
+    """Parse "x0,y0,x1,y1[,z0,z1]" into a Region, the bounds are inclusive and z defaults to all the levels."""
+    try:
+        bounds = [ int(bound) for bound in region_text.split(",") ]
+    except ValueError:
+        bounds = []
+    if len(bounds) == 4:
+        bounds += [0, MAP_MAX_Z]
+    if len(bounds) != 6:
+        raise ValueError(f"Invalid region '{region_text}', expected x0,y0,x1,y1[,z0,z1]")
+
+    region = Region(*bounds)
+    if not (0 <= region.x0 <= region.x1 <= MAP_WIDTH and 0 <= region.y0 <= region.y1 <= MAP_HEIGHT
+            and 0 <= region.z0 <= region.z1 <= MAP_MAX_Z):
+        raise ValueError(f"Region '{region_text}' is empty or outside the {MAP_WIDTH+1}x{MAP_HEIGHT+1}x{MAP_MAX_Z+1} map")
+    return region
+
+def decode_region(psx_views, region, decode_column=None):
+    """Decode the blocks of a region into a contiguous [z][y][x] array of 12-byte blocks.
+
+    Only the base table entries of the region are read and only the columns
+    they point to are decoded, so the cost follows the region area instead
+    of the whole 256x256x8 volume."""
+    if decode_column is None:
+        decode_column = make_column_decoder(psx_views)
+
+    base_table = psx_views["base_table"]
+
+    column_stacks = {}
+    row_stacks = []
+    for y in range(region.y0, region.y1+1):
+        row_words = read_words(base_table[2*(y*256 + region.x0) : 2*(y*256 + region.x1 + 1)])
+        for words_offset in row_words:
+            if words_offset in column_stacks:
+                continue
+            column_offset, column_blocks = decode_column(words_offset)
+            column_stack = [EMPTY_BLOCK_DATA]*(MAP_MAX_Z+1)
+            column_stack[column_offset : column_offset + len(column_blocks)] = column_blocks
+            column_stacks[words_offset] = column_stack
+        row_stacks.append([ column_stacks[words_offset] for words_offset in row_words ])
+
+    region_rows = []
+    for z in range(region.z0, region.z1+1):
+        block_getter = itemgetter(z)
+        for row_stack in row_stacks:
+            region_rows.append(b"".join(map(block_getter, row_stack)))
+    return b"".join(region_rows)
+
+def pad_region(region_data, region):
+    """Put the blocks of a region at their place in an otherwise empty UMAP volume."""
+    umap_data = bytearray(UMAP_SIZE)
+    region_row_size = BLOCK_INFO_SIZE*(region.x1 - region.x0 + 1)
+
+    region_offset = 0
+    for z in range(region.z0, region.z1+1):
+        for y in range(region.y0, region.y1+1):
+            umap_offset = z*UMAP_PLANE_SIZE + y*UMAP_ROW_SIZE + BLOCK_INFO_SIZE*region.x0
+            umap_data[umap_offset : umap_offset + region_row_size] = region_data[region_offset : region_offset + region_row_size]
+            region_offset += region_row_size
+    return umap_data
+
+def crop_zones(zone_table, region):
+    """Return the ZONE chunk data with only the zones overlapping the region, in chunk order."""
+    zone_records = []
+    for zone_idx, (x, y, w, h) in enumerate(zip(zone_table.xs, zone_table.ys, zone_table.widths, zone_table.heights)):
+        if x <= region.x1 and x + w > region.x0 and y <= region.y1 and y + h > region.y0:
+            name_offset = zone_table.name_offsets[zone_idx]
+            zone_records.append(zone_table.data[name_offset - ZONE_TYPE_COORDS_DATA_SIZE - 1 :
+                                                name_offset + zone_table.name_lengths[zone_idx]])
+    return b"".join(zone_records)
+
+def convert_psx_region(psx_gmp_path, output_path, region, edit_file=None, compression=None, raw=False, rgen=False):
+    """Convert a region of a PSX map, return the number of blocks decoded.
+
+    The output is a PC gmp where everything outside the region is empty,
+    with the zones overlapping the region and all the animations, or with
+    raw the bare [z][y][x] block array of the region."""
+    gmp_data = read_gmp_file(psx_gmp_path)
+    chunk_infos, cmap_info = get_chunk_infos(scan_psx_chunks(gmp_data))
+    psx_views = get_psx_map_views(gmp_data, chunk_infos, cmap_info)
+
+    region_data = decode_region(psx_views, region)
+
+    if raw:
+        with atomic_output(output_path) as file:
+            file.write(region_data)
+    else:
+        check_required_chunks(chunk_infos)
+        zone_data = crop_zones(ZoneTable(psx_views["ZONE"]), region)
+        edit_data = read_edit_file(edit_file)
+        with atomic_output(output_path) as file:
+            write_gmp(file, pad_region(region_data, region), zone_data, psx_views["ANIM"], chunk_infos, edit_data,
+                      compression, get_gmp_rgen(psx_views) if rgen else None)
+
+    return len(region_data) // BLOCK_INFO_SIZE
+
+def get_tile_regions(num_tiles):
+    """Split the map into num_tiles x num_tiles regions, return them as (tile x, tile y, region)."""
+    x_bounds = [ (MAP_WIDTH+1)*tile_idx // num_tiles for tile_idx in range(num_tiles+1) ]
+    y_bounds = [ (MAP_HEIGHT+1)*tile_idx // num_tiles for tile_idx in range(num_tiles+1) ]
+    return [ (tile_x, tile_y, Region(x_bounds[tile_x], y_bounds[tile_y], x_bounds[tile_x+1] - 1, y_bounds[tile_y+1] - 1,
+                                     0, MAP_MAX_Z))
+             for tile_y in range(num_tiles) for tile_x in range(num_tiles) ]
+
+def convert_tile_entry(psx_gmp_path, output_path, region, edit_file, compression, raw, rgen=False):
+    """Convert one tile inside a worker process and return its summary, as convert_batch_entry does."""
+    start_time = time.perf_counter()
+    result = dict(tile = Path(output_path).name, output = str(output_path), size = None, time = None, status = "OK")
+    try:
+        convert_psx_region(psx_gmp_path, output_path, region, edit_file, compression, raw, rgen)
+        result["size"] = os.path.getsize(output_path)
+    except (Exception, SystemExit) as error:
+        result["status"] = f"FAILED: {type(error).__name__}: {error}"
+    result["time"] = time.perf_counter() - start_time
+    return result
+
+def main_tiles(argv):
+    parser = argparse.ArgumentParser(f"{PROGRAM_NAME} tiles",
+                                     description="Split a PSX gmp map into NxN regions and convert them in parallel.")
+    parser.add_argument("psx_gmp_path")
+    parser.add_argument("output_dir")
+    parser.add_argument("-n", "--tiles", type=int, default=4, help="number of tiles along each side (default: 4)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--compress", choices=["dmap", "cmap"],
+                        help="write a compressed DMAP (32-bit) or CMAP (16-bit) map instead of the UMAP")
+    parser.add_argument("--raw", action="store_true", help="write the bare block array of each tile instead of a gmp")
+    parser.add_argument("--rgen", action="store_true", help="copy the RGEN chunk of the map to each tile gmp")
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if not 1 <= args.tiles <= MAP_WIDTH+1:
+        parser.error(f"--tiles must be between 1 and {MAP_WIDTH+1}")
+    if args.raw and args.compress:
+        parser.error("--raw writes the bare blocks, it can't be used with --compress")
+
+    psx_gmp_path = Path(args.psx_gmp_path)
+    if not psx_gmp_path.is_file():
+        print(f"Input gmp file doesn't exists. Path: {psx_gmp_path}")
+        sys.exit(-1)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    extension = "bin" if args.raw else "gmp"
+
+    # like batch, the tiles get the edit file matching the map name
+    edit_file = None if args.raw else find_edit_file(psx_gmp_path)
+
+    tile_regions = get_tile_regions(args.tiles)
+    print(f"Converting {len(tile_regions)} tiles of {psx_gmp_path.name} with {args.jobs} workers...")
+    if edit_file is not None:
+        print(f"Edit file: {edit_file}")
+    print("")
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = []
+        for tile_x, tile_y, region in tile_regions:
+            output_path = output_dir / f"psx_{psx_gmp_path.stem.lower()}_{tile_x}_{tile_y}.{extension}"
+            futures.append(executor.submit(convert_tile_entry, psx_gmp_path, output_path, region, edit_file, args.compress,
+                                           args.raw, args.rgen))
+
+        results = [ future.result() for future in futures ]
+
+    num_failed = 0
+    for (_, _, region), result in zip(tile_regions, results):
+        if result["status"] != "OK":
+            num_failed += 1
+        size = "-" if result["size"] is None else "{:,} bytes".format(result["size"])
+        bounds = f"({region.x0}, {region.y0})-({region.x1}, {region.y1})"
+        print(f"{result['tile']:<28} {bounds:<22} {size:>18} {result['time']:8.2f}s  {result['status']}")
+
+    print(f"\n{len(results) - num_failed} converted, {num_failed} failed in {time.perf_counter() - start_time:.2f}s")
+
+    if num_failed:
+        sys.exit(-1)
+
+############ Incremental reconversion
+
+def get_fingerprint_path(output_path):
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + FINGERPRINT_SUFFIX)
+
+def get_cell_fingerprints(psx_views):
+    """Return a crc32 per cell of its raw column and of the raw block info its block ids point to."""
+    base_table = read_words(psx_views["base_table"])
+    columns = psx_views["columns"]
+    column_words = read_words(columns)
+    complete_blocks = psx_views["complete_blocks"]
+    lid_blocks = psx_views["lid_blocks"]
+
+    column_crcs = {}
+    for words_offset in set(base_table):
+        if words_offset >= len(column_words):
+            raise PsxCorruptMapError(f"Column word offset {words_offset} is past the {len(column_words)} column words")
+        column_header = column_words[words_offset]
+        num_blocks = max((column_header & 0xFF) - (column_header >> 8), 0)
+
+        crc = zlib.crc32(columns[2*words_offset : 2*(words_offset + 1 + num_blocks)])
+        for block_id in column_words[words_offset + 1 : words_offset + 1 + num_blocks]:
+            if (block_id < 32768):
+                crc = zlib.crc32(complete_blocks[BLOCK_INFO_SIZE*block_id : BLOCK_INFO_SIZE*(block_id + 1)], crc)
+            else:
+                crc = zlib.crc32(lid_blocks[4*(block_id - 32768) : 4*(block_id - 32767)], crc)
+        column_crcs[words_offset] = crc
+
+    return array('I', [ column_crcs[words_offset] for words_offset in base_table ])
+
+def get_map_fingerprint(psx_views, edit_data, rgen=False):
+    """Return the fingerprint of everything that ends up in the output gmp."""
+    def chunk_hash(data):
+        return None if data is None else hashlib.sha1(data).hexdigest()
+
+    return dict(cells = get_cell_fingerprints(psx_views),
+                ZONE = chunk_hash(psx_views["ZONE"]),
+                ANIM = chunk_hash(psx_views["ANIM"]),
+                RGEN = chunk_hash(get_gmp_rgen(psx_views)) if rgen else None,
+                EDIT = chunk_hash(edit_data))
+
+def save_fingerprint(output_path, fingerprint):
+    output_stat = os.stat(output_path)
+    fingerprint_data = dict(version = FINGERPRINT_VERSION,
+                            output_size = output_stat.st_size,
+                            output_mtime_ns = output_stat.st_mtime_ns,
+                            cells = base64.b64encode(words_to_bytes(fingerprint["cells"])).decode('ascii'),
+                            ZONE = fingerprint["ZONE"],
+                            ANIM = fingerprint["ANIM"],
+                            RGEN = fingerprint["RGEN"],
+                            EDIT = fingerprint["EDIT"])
+
+    with open(get_fingerprint_path(output_path), 'w') as file:
+        json.dump(fingerprint_data, file)
+
+def load_fingerprint(output_path):
+    """Return the fingerprint stored by the last run, or None if the output changed since then."""
+    try:
+        with open(get_fingerprint_path(output_path), 'r') as file:
+            fingerprint_data = json.load(file)
+        output_stat = os.stat(output_path)
+    except (OSError, ValueError):
+        return None
+
+    if (fingerprint_data.get("version") != FINGERPRINT_VERSION
+        or fingerprint_data.get("output_size") != output_stat.st_size
+        or fingerprint_data.get("output_mtime_ns") != output_stat.st_mtime_ns):
+        return None
+
+    cells = read_words_32(base64.b64decode(fingerprint_data["cells"]))
+    if len(cells) != (MAP_WIDTH+1)*(MAP_HEIGHT+1):
+        return None
+
+    return dict(cells = cells,
+                ZONE = fingerprint_data["ZONE"],
+                ANIM = fingerprint_data["ANIM"],
+                RGEN = fingerprint_data["RGEN"],
+                EDIT = fingerprint_data["EDIT"])
+
+def get_changed_cell_runs(old_cells, new_cells):
+    """Return the (start, end) cell index ranges whose fingerprint changed, split at row ends."""
+    cell_runs = []
+    run_start = None
+    for cell_idx, (old_crc, new_crc) in enumerate(zip(old_cells, new_cells)):
+        changed = (old_crc != new_crc)
+        if run_start is not None and (not changed or cell_idx % 256 == 0):
+            cell_runs.append( (run_start, cell_idx) )
+            run_start = None
+        if changed and run_start is None:
+            run_start = cell_idx
+    if run_start is not None:
+        cell_runs.append( (run_start, len(new_cells)) )
+    return cell_runs
+
+def patch_uncompressed_map(file, psx_views, cell_runs, decode_column=None):
+    """Re-decode the cells of each run and write their blocks over the UMAP of an open output gmp.
+
+    Every run is decoded before the first write, so a corrupt map raises
+    without touching the output."""
+    if decode_column is None:
+        decode_column = make_column_decoder(psx_views)
+
+    base_table = psx_views["base_table"]
+    written_bytes = 0
+
+    decoded_runs = []
+    for run_start, run_end in cell_runs:
+        run_stacks = []
+        for cell_idx in range(run_start, run_end):
+            words_offset = int.from_bytes(base_table[2*cell_idx : 2*cell_idx + 2], 'little')
+            column_offset, column_blocks = decode_column(words_offset)
+
+            column_stack = [EMPTY_BLOCK_DATA]*(MAP_MAX_Z+1)
+            column_stack[column_offset : column_offset + len(column_blocks)] = column_blocks
+            run_stacks.append(column_stack)
+        decoded_runs.append( (run_start, run_stacks) )
+
+    for run_start, run_stacks in decoded_runs:
+        for z in range(MAP_MAX_Z+1):
+            file.seek(UMAP_DATA_OFFSET + BLOCK_INFO_SIZE*(z*256*256 + run_start))
+            written_bytes += file.write(b"".join( column_stack[z] for column_stack in run_stacks ))
+
+    return written_bytes
+
+def write_gmp_tail(file, psx_views, chunk_infos, edit_data, rgen=False):
+    """Rewrite ZONE, ANIM, RGEN (if asked for) and EDIT after the UMAP of an open output gmp."""
+    file.seek(UMAP_DATA_OFFSET + UMAP_SIZE)
+    file.write(build_gmp_tail(psx_views["ZONE"], psx_views["ANIM"], get_gmp_rgen(psx_views) if rgen else None, edit_data))
+    file.truncate()
+
+def convert_psx_file_incremental(psx_gmp_path, output_path, edit_file=None, index_cache=False, rgen=False):
+    """Convert a map patching only what changed in the output since the last run.
+
+    Falls back to a full conversion when there is no usable fingerprint."""
+    print(f"\nOpening file {psx_gmp_path}...\n")
+    gmp_data, gmp_stat = read_gmp_file_stat(psx_gmp_path)
+    if index_cache:
+        chunk_index = load_chunk_index(psx_gmp_path, gmp_data, gmp_stat)
+    else:
+        chunk_index = scan_psx_chunks(gmp_data)
+    chunk_infos, cmap_info = read_psx_map(gmp_data, chunk_index)
+    check_required_chunks(chunk_infos)
+    psx_views = get_psx_map_views(gmp_data, chunk_infos, cmap_info)
+
+    edit_data = read_edit_file(edit_file)
+    fingerprint = get_map_fingerprint(psx_views, edit_data, rgen)
+    old_fingerprint = load_fingerprint(output_path)
+
+    if old_fingerprint is None:
+        print("No fingerprint of a previous run matches the output, doing a full conversion")
+        convert_psx_file(psx_gmp_path, output_path, edit_file, index_cache=index_cache, rgen=rgen)
+    else:
+        cell_runs = get_changed_cell_runs(old_fingerprint["cells"], fingerprint["cells"])
+        tail_changed = any( fingerprint[chunk] != old_fingerprint[chunk] for chunk in ("ZONE", "ANIM", "RGEN", "EDIT") )
+
+        with open(output_path, 'r+b') as file:
+            written_bytes = patch_uncompressed_map(file, psx_views, cell_runs)
+            if tail_changed:
+                write_gmp_tail(file, psx_views, chunk_infos, edit_data, rgen)
+
+        num_cells = sum( run_end - run_start for run_start, run_end in cell_runs )
+        print(f"Patched {num_cells} cells in {len(cell_runs)} runs ({written_bytes:,} UMAP bytes)")
+        if tail_changed:
+            print("ZONE/ANIM/RGEN/EDIT changed, rewrote them")
+
+    save_fingerprint(output_path, fingerprint)
+
+############ Conversion cache
+
+def get_conversion_key(gmp_data, edit_data, compression, rgen=False):
+    """Return the cache key of a conversion: a hash of everything the output depends on."""
+    key_hash = hashlib.sha256()
+    key_hash.update(f"{CONVERTER_VERSION}:{compression}:{rgen}:{len(gmp_data)}:".encode('ascii'))
+    key_hash.update(gmp_data)
+    if edit_data is not None:
+        key_hash.update(b"EDIT")
+        key_hash.update(edit_data)
+    return key_hash.hexdigest()
+
+def get_cache_entry_path(cache_dir, key):
+    return Path(cache_dir) / f"{key}{CONVERSION_CACHE_SUFFIX}"
+
+def link_or_copy(source_path, target_path):
+    """Hard link source_path to target_path, copying it where hard links aren't possible.
+
+    The link or the copy is made under a temporary name and renamed over
+    target_path, so target_path is never missing or half written."""
+    target_path = Path(target_path)
+    temp_path = target_path.with_name(f"{target_path.name}.{os.getpid()}.tmp")
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(temp_path)
+
+    try:
+        os.link(source_path, temp_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        with open(source_path, 'rb') as source_file, atomic_output(target_path) as file:
+            shutil.copyfileobj(source_file, file)
+        return
+    os.replace(temp_path, target_path)
+
+def restore_cached_conversion(cache_dir, key, output_path):
+    """Put the cached output of a conversion at output_path, return False if it isn't cached."""
+    entry_path = get_cache_entry_path(cache_dir, key)
+    try:
+        os.utime(entry_path)    # the mtime of an entry is its last use
+        link_or_copy(entry_path, output_path)
+    except FileNotFoundError:
+        return False
+    return True
+
+def store_cached_conversion(cache_dir, key, output_path, cache_size):
+    """Copy a converted map into the cache, then evict the least recently used entries above cache_size bytes."""
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # copy under a temporary name first, so concurrent conversions never see half an entry
+    entry_path = get_cache_entry_path(cache_dir, key)
+    temp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.tmp")
+    shutil.copyfile(output_path, temp_path)
+    os.replace(temp_path, entry_path)
+
+    evict_cached_conversions(cache_dir, cache_size)
+
+def evict_cached_conversions(cache_dir, cache_size):
+    """Delete the least recently used cache entries until the cache fits in cache_size bytes."""
+    entries = []
+    for entry_path in Path(cache_dir).glob(f"*{CONVERSION_CACHE_SUFFIX}"):
+        try:
+            entry_stat = entry_path.stat()
+        except FileNotFoundError:   # evicted by another process meanwhile
+            continue
+        entries.append( (entry_stat.st_mtime_ns, entry_stat.st_size, entry_path) )
+
+    total_size = sum( entry_size for _, entry_size, _ in entries )
+    for _, entry_size, entry_path in sorted(entries):
+        if total_size <= cache_size:
+            break
+        try:
+            entry_path.unlink()
+        except FileNotFoundError:
+            pass
+        total_size -= entry_size
+
+def convert_psx_file_cached(psx_gmp_path, output_path, edit_file, cache_dir, cache_size=CONVERSION_CACHE_SIZE,
+                            engine="volume", compression=None, profile=None, index_cache=False, rgen=False):
+    """Convert a map through the conversion cache, return True on a cache hit.
+
+    A hit links (or copies) the cached output without decoding anything, a
+    miss converts the map normally and adds its output to the cache."""
+    key = get_conversion_key(read_gmp_file(psx_gmp_path), read_edit_file(edit_file), compression, rgen)
+
+    if restore_cached_conversion(cache_dir, key, output_path):
+        print(f"Conversion cache hit: {key[:16]}")
+        cache_hit = True
+    else:
+        print(f"Conversion cache miss: {key[:16]}")
+        convert_psx_file(psx_gmp_path, output_path, edit_file, engine, compression=compression, profile=profile,
+                         index_cache=index_cache, rgen=rgen)
+        store_cached_conversion(cache_dir, key, output_path, cache_size)
+        cache_hit = False
+
+    if profile is not None:
+        profile["cache"] = "hit" if cache_hit else "miss"
+    return cache_hit
+
+############ Watch mode
+
+class MapWatcher:
+    """Reconverts a map whenever it or its edit file change, keeping the last conversion in memory.
+
+    The cell fingerprints of the last conversion are kept, so a change of
+    the map only decodes the cells whose column or blocks changed and
+    patches them in the UMAP of the output, as --incremental does but
+    without reading anything else than the map again.
+
+    The output is only patched while it's still the file the watcher wrote
+    last (same inode, size and mtime, and no other hard link to it): if it
+    was replaced or is shared with a conversion cache entry, it's written
+    again in full."""
+
+    def __init__(self, psx_gmp_path, output_path, edit_file=None, compression=None, rgen=False):
+        self.psx_gmp_path = Path(psx_gmp_path)
+        self.output_path = Path(output_path)
+        self.edit_file = edit_file
+        self.compression = compression
+        self.rgen = rgen
+        self.input_stamps = None
+        self.output_stamp = None
+        self.fingerprint = None
+
+    def get_input_stamps(self):
+        """Return the (mtime, size) of the map and of the edit file, None for a missing file."""
+        input_stamps = []
+        for path in (self.psx_gmp_path, None if self.edit_file is None else ROOT_DIR / self.edit_file):
+            try:
+                path_stat = os.stat(path)
+                input_stamps.append( (path_stat.st_mtime_ns, path_stat.st_size) )
+            except (OSError, TypeError):
+                input_stamps.append(None)
+        return tuple(input_stamps)
+
+    def get_output_stamp(self):
+        """Return the (inode, size, mtime, link count) of the output, or None if it's missing."""
+        try:
+            output_stat = os.stat(self.output_path)
+        except OSError:
+            return None
+        return (output_stat.st_ino, output_stat.st_size, output_stat.st_mtime_ns, output_stat.st_nlink)
+
+    def can_patch_output(self):
+        """Return True if the output is still the UMAP gmp this watcher wrote, and only linked from there."""
+        output_stamp = self.get_output_stamp()
+        return (self.compression is None and self.fingerprint is not None and output_stamp is not None
+                and output_stamp == self.output_stamp and output_stamp[3] == 1)
+
+    def update(self):
+        """Convert the map again, return a summary of what was written."""
+        gmp_data = read_gmp_file(self.psx_gmp_path)
+        chunk_infos, cmap_info = get_chunk_infos(scan_psx_chunks(gmp_data))
+        check_required_chunks(chunk_infos)
+        psx_views = get_psx_map_views(gmp_data, chunk_infos, cmap_info)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            edit_data = read_edit_file(self.edit_file)
+        fingerprint = get_map_fingerprint(psx_views, edit_data, self.rgen)
+
+        cell_runs = None
+        if self.can_patch_output():
+            cell_runs = get_changed_cell_runs(self.fingerprint["cells"], fingerprint["cells"])
+            num_cells = sum( run_end - run_start for run_start, run_end in cell_runs )
+            if num_cells > WATCH_MAX_PATCHED_CELLS:
+                cell_runs = None    # writing all the rows is faster than seeking to that many runs
+
+        if cell_runs is None:
+            self.fingerprint = None
+            self.output_stamp = None
+            with atomic_output(self.output_path) as file:
+                write_gmp(file, iter_umap_rows(get_cell_stacks(psx_views)), psx_views["ZONE"], psx_views["ANIM"],
+                          chunk_infos, edit_data, self.compression, get_gmp_rgen(psx_views) if self.rgen else None)
+            summary = "converted"
+        else:
+            tail_changed = any( fingerprint[chunk] != self.fingerprint[chunk] for chunk in ("ZONE", "ANIM", "RGEN", "EDIT") )
+
+            # forget the fingerprint while the output is being patched, a failure leaves it half written
+            self.fingerprint = None
+            self.output_stamp = None
+            with open(self.output_path, 'r+b') as file:
+                patch_uncompressed_map(file, psx_views, cell_runs)
+                if tail_changed:
+                    write_gmp_tail(file, psx_views, chunk_infos, edit_data, self.rgen)
+
+            summary = f"patched {num_cells} cells" + (", rewrote ZONE/ANIM/RGEN/EDIT" if tail_changed else "")
+
+        self.fingerprint = fingerprint
+        self.output_stamp = self.get_output_stamp()
+        return summary
+
+    def poll(self):
+        """Reconvert the map if its files changed since the last poll, return True if it did."""
+        input_stamps = self.get_input_stamps()
+        if input_stamps == self.input_stamps:
+            return False
+        # the stamps are taken before reading, a save during the conversion is seen at the next poll
+        self.input_stamps = input_stamps
+
+        if input_stamps[0] is None:
+            print(f"{time.strftime('%H:%M:%S')} {self.psx_gmp_path.name}: map not found")
+            return False
+
+        start_time = time.perf_counter()
+        try:
+            summary = self.update()
+        except (OSError, PsxMapError) as error:
+            print(f"{time.strftime('%H:%M:%S')} {self.psx_gmp_path.name}: ERROR: {error}")
+            return False
+
+        print(f"{time.strftime('%H:%M:%S')} {self.psx_gmp_path.name}: {summary} -> {self.output_path} "
+              f"in {(time.perf_counter() - start_time)*1000:.1f} ms")
+        return True
+
+def watch_maps(watchers, poll_interval=WATCH_POLL_INTERVAL):
+    """Poll the watched maps until interrupted with Ctrl+C."""
+    print(f"Watching {len(watchers)} maps every {poll_interval}s, press Ctrl+C to stop...\n")
+    try:
+        while True:
+            for watcher in watchers:
+                watcher.poll()
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+
+############ Batch conversion
+
+def find_edit_file(psx_gmp_path):
+    """Return the *_edit.data file matching a map name (WIL.GMP -> wil_edit.data), or None."""
+    psx_gmp_path = Path(psx_gmp_path)
+    edit_filename = f"{psx_gmp_path.stem.lower()}_edit.data"
+
+    for edit_dir in (psx_gmp_path.parent, ROOT_DIR):
+        edit_file_path = edit_dir / edit_filename
+        if edit_file_path.exists():
+            return edit_file_path
+    return None
+
+def find_psx_maps(psx_maps_path):
+    """Return the PSX gmp files in a directory, or the files matching a glob pattern."""
+    psx_maps_path = Path(psx_maps_path)
+    if psx_maps_path.is_dir():
+        gmp_paths = [ path for path in psx_maps_path.iterdir() if path.suffix.lower() == ".gmp" ]
+    else:
+        gmp_paths = [ path for path in psx_maps_path.parent.glob(psx_maps_path.name) if path.is_file() ]
+    return sorted(gmp_paths)
+
+def convert_batch_entry(psx_gmp_path, output_path, edit_file, engine, compression, profile_path=None, index_cache=False,
+                        cache_dir=None, cache_size=CONVERSION_CACHE_SIZE, validate=True, rgen=False):
+    """Convert one map of a batch inside a worker process and return its summary.
+    
+    Any error (including a sys.exit from a conversion stage) is reported in 
+    the summary instead of killing the worker. With validate, a map with 
+    structural errors is rejected before anything gets decoded."""
+    start_time = time.perf_counter()
+    result = dict(map = Path(psx_gmp_path).name, output = str(output_path), size = None, time = None, status = "OK",
+                  cache = None, problems = [])
+    try:
+        if validate:
+            report = validate_psx_map(read_gmp_file(psx_gmp_path))
+            if not report["valid"]:
+                result["status"] = f"REJECTED: {report['errors']} errors"
+                result["problems"] = [ problem for problem in report["problems"] if problem["severity"] == "error" ]
+                result["time"] = time.perf_counter() - start_time
+                return result
+
+        profile = None if profile_path is None else new_profile()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if cache_dir is None:
+                convert_psx_file(psx_gmp_path, output_path, edit_file, engine, compression=compression, profile=profile,
+                                 index_cache=index_cache, rgen=rgen)
+            else:
+                cache_hit = convert_psx_file_cached(psx_gmp_path, output_path, edit_file, cache_dir, cache_size, engine,
+                                                    compression, profile, index_cache, rgen)
+                result["cache"] = "hit" if cache_hit else "miss"
+        result["size"] = os.path.getsize(output_path)
+        if profile is not None:
+            write_profile(profile, profile_path)
+    except (Exception, SystemExit) as error:
+        result["status"] = f"FAILED: {type(error).__name__}: {error}"
+    result["time"] = time.perf_counter() - start_time
+    return result
+
+def main_batch(argv):
+    parser = argparse.ArgumentParser(f"{PROGRAM_NAME} batch",
+                                     description="Convert every PSX gmp file of a directory or glob pattern in parallel.")
+    parser.add_argument("psx_maps_path", help="directory or glob pattern of PSX gmp files")
+    parser.add_argument("output_dir")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--engine", choices=["volume", "reference"], default="volume",
+                        help="CMAP decompression engine (default: volume)")
+    parser.add_argument("--compress", choices=["dmap", "cmap"],
+                        help="write a compressed DMAP (32-bit) or CMAP (16-bit) map instead of the UMAP")
+    parser.add_argument("--index-cache", action="store_true",
+                        help=f"keep the chunk index of each map in a {CHUNK_INDEX_CACHE_SUFFIX} file next to it")
+    parser.add_argument("--profile-dir", help="write a JSON profile report of every map to this directory")
+    parser.add_argument("--cache-dir", help="reuse the outputs of previous conversions kept in this directory")
+    parser.add_argument("--cache-size", type=int, default=CONVERSION_CACHE_SIZE // 2**20,
+                        help=f"maximum size of the conversion cache in MB (default: {CONVERSION_CACHE_SIZE // 2**20})")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and reconvert the maps found at start whenever they or their edit files change")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="don't check the structure of the maps before converting them")
+    parser.add_argument("--rgen", action="store_true", help="copy the RGEN chunk of the maps to the PC maps")
+    parser.add_argument("--poll-interval", type=float, default=WATCH_POLL_INTERVAL,
+                        help=f"seconds between two checks of the watched files (default: {WATCH_POLL_INTERVAL})")
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.watch and (args.cache_dir or args.profile_dir):
+        parser.error("--watch can't be used with --cache-dir or --profile-dir")
+
+    gmp_paths = find_psx_maps(args.psx_maps_path)
+    if not gmp_paths:
+        print(f"No PSX gmp files found at {args.psx_maps_path}")
+        sys.exit(-1)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.watch:
+        # the maps are watched from this process, their last conversion stays in its memory
+        watchers = [ MapWatcher(psx_gmp_path, output_dir / f"psx_{psx_gmp_path.stem.lower()}.gmp",
+                                find_edit_file(psx_gmp_path), args.compress, args.rgen)
+                     for psx_gmp_path in gmp_paths ]
+        watch_maps(watchers, args.poll_interval)
+        return
+
+    if args.profile_dir is not None:
+        Path(args.profile_dir).mkdir(parents=True, exist_ok=True)
+
+    print(f"Converting {len(gmp_paths)} maps with {args.jobs} workers...\n")
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = []
+        for psx_gmp_path in gmp_paths:
+            output_path = output_dir / f"psx_{psx_gmp_path.stem.lower()}.gmp"
+            edit_file = find_edit_file(psx_gmp_path)
+            profile_path = None
+            if args.profile_dir is not None:
+                profile_path = Path(args.profile_dir) / f"{psx_gmp_path.stem.lower()}_profile.json"
+            futures.append(executor.submit(convert_batch_entry, psx_gmp_path, output_path, edit_file,
+                                           args.engine, args.compress, profile_path, args.index_cache,
+                                           args.cache_dir, args.cache_size*2**20, not args.no_validate, args.rgen))
+
+        results = [ future.result() for future in futures ]
+
+    num_failed = 0
+    for result in results:
+        if result["status"] != "OK":
+            num_failed += 1
+        size = "-" if result["size"] is None else "{:,} bytes".format(result["size"])
+        cache = "" if result["cache"] is None else f" (cache {result['cache']})"
+        print(f"{result['map']:<24} {size:>18} {result['time']:8.2f}s  {result['status']}{cache}")
+        for problem in result["problems"][:3]:
+            print(f"    {problem['check']}: {problem['message']}")
+        if len(result["problems"]) > 3:
+            print(f"    ...")
+
+    print(f"\n{len(results) - num_failed} converted, {num_failed} failed in {time.perf_counter() - start_time:.2f}s")
+    if args.cache_dir is not None:
+        num_hits = sum( result["cache"] == "hit" for result in results )
+        num_misses = sum( result["cache"] == "miss" for result in results )
+        print(f"Conversion cache: {num_hits} hits, {num_misses} misses")
+
+    if num_failed:
+        sys.exit(-1)
+
+############ Inspection
+
+def weighted_histogram(values, weights):
+    """Return {value: summed weight} for the values with a non null weight, sorted by value."""
+    histogram = Counter()
+    for value, weight in zip(values, weights):
+        if weight:
+            histogram[value] += weight
+    return { str(value): histogram[value] for value in sorted(histogram) }
+
+def expand_lid_blocks(lid_data):
+    """Turn the 4-byte lid only block table into 12-byte blocks with null sides."""
+    num_blocks = len(lid_data) // 4
+    blocks_data = bytearray(BLOCK_INFO_SIZE*num_blocks)
+    for byte_idx in range(4):
+        blocks_data[8+byte_idx::BLOCK_INFO_SIZE] = lid_data[byte_idx::4]
+    return blocks_data
+
+def inspect_psx_map(gmp_data):
+    """Return the tile, slope, column and block id statistics of a PSX map.
+
+    Block counts are weighted by how many cells place each block, so they 
+    describe the map as converted."""
+    chunk_index = scan_psx_chunks(gmp_data)
+    chunk_infos, cmap_info = get_chunk_infos(chunk_index)
+    psx_views = get_psx_map_views(gmp_data, chunk_infos, cmap_info)
+
+    base_table = read_words(psx_views["base_table"])
+    column_words = read_words(psx_views["columns"])
+
+    num_complete_blocks = cmap_info["num_complete_blocks"]
+    num_lid_blocks_only = cmap_info["num_lid_blocks_only"]
+    complete_placements = array('I', bytes(4*num_complete_blocks))
+    lid_placements = array('I', bytes(4*num_lid_blocks_only))
+
+    column_sharing = Counter()
+    column_heights = Counter()
+    column_offsets = Counter()
+    out_of_range_ids = 0
+    out_of_range_columns = 0
+
+    for words_offset, num_cells in Counter(base_table).items():
+        column_sharing[num_cells] += 1
+
+        # a corrupt base table entry is counted, validate_psx_map tells where it is
+        if words_offset >= len(column_words):
+            out_of_range_columns += num_cells
+            continue
+
+        column_header = column_words[words_offset]
+        column_height = column_header & 0xFF
+        column_offset = column_header >> 8
+        column_heights[column_height] += num_cells
+        column_offsets[column_offset] += num_cells
+
+        for block_id in column_words[words_offset + 1 : words_offset + 1 + max(column_height - column_offset, 0)]:
+            if block_id < 32768:
+                if block_id < num_complete_blocks:
+                    complete_placements[block_id] += num_cells
+                else:
+                    out_of_range_ids += num_cells
+            elif block_id - 32768 < num_lid_blocks_only:
+                lid_placements[block_id - 32768] += num_cells
+            else:
+                out_of_range_ids += num_cells
+
+    complete_fields = decode_block_fields(psx_views["complete_blocks"])
+    lid_fields = decode_block_fields(expand_lid_blocks(psx_views["lid_blocks"].tobytes()))
+
+    tiles = {}
+    for face_name in ("left", "right", "top", "bottom"):
+        tiles[face_name] = weighted_histogram(complete_fields[f"{face_name}_tile"], complete_placements)
+    tiles["lid"] = weighted_histogram(list(complete_fields["lid_tile"]) + list(lid_fields["lid_tile"]),
+                                      list(complete_placements) + list(lid_placements))
+
+    slope_types = weighted_histogram(list(complete_fields["slope_type"]) + list(lid_fields["slope_type"]),
+                                     list(complete_placements) + list(lid_placements))
+
+    # complete 3-sided slopes with lid tile 384, which fix_psx_slope turns into 1023
+    fixed_slope_placements = [ placements if (49 <= slope_type <= 52 and lid_tile == 384) else 0
+                               for slope_type, lid_tile, placements in zip(complete_fields["slope_type"], 
+                                                                           complete_fields["lid_tile"], 
+                                                                           complete_placements) ]
+
+    used_complete_ids = [ block_id for block_id, placements in enumerate(complete_placements) if placements ]
+    used_lid_ids = [ 32768 + block_idx for block_idx, placements in enumerate(lid_placements) if placements ]
+
+    return dict(file_size = chunk_index.file_size,
+                chunks = { chunk.name: dict(offset = chunk.data_offset, size = chunk.size, padding = chunk.padding)
+                           for chunk in chunk_index.chunks },
+                blocks = dict(complete_blocks = num_complete_blocks,
+                              lid_only_blocks = num_lid_blocks_only,
+                              placed_complete_blocks = sum(complete_placements),
+                              placed_lid_only_blocks = sum(lid_placements),
+                              out_of_range_block_ids = out_of_range_ids,
+                              complete_block_id_range = [min(used_complete_ids), max(used_complete_ids)] if used_complete_ids else None,
+                              lid_only_block_id_range = [min(used_lid_ids), max(used_lid_ids)] if used_lid_ids else None,
+                              fixed_slope_tiles = sum(fixed_slope_placements),
+                              fixed_slope_blocks = sum( 1 for placements in fixed_slope_placements if placements )),
+                columns = dict(column_words = cmap_info["column_words"],
+                               distinct_columns = sum(column_sharing.values()),
+                               out_of_range_column_offsets = out_of_range_columns,
+                               cells_per_column = { str(num_cells): column_sharing[num_cells] for num_cells in sorted(column_sharing) },
+                               heights = { str(height): column_heights[height] for height in sorted(column_heights) },
+                               offsets = { str(offset): column_offsets[offset] for offset in sorted(column_offsets) }),
+                tiles = tiles,
+                slope_types = slope_types)
+
+def main_inspect(argv):
+    parser = argparse.ArgumentParser(f"{PROGRAM_NAME} inspect",
+                                     description="Print tile, slope, column and block id statistics of PSX gmp maps as JSON.")
+    parser.add_argument("psx_gmp_paths", nargs='+')
+    parser.add_argument("-o", "--output", help="write the JSON report to this file instead of the standard output")
+    args = parser.parse_args(argv)
+
+    reports = []
+    num_failed = 0
+    for psx_gmp_path in args.psx_gmp_paths:
+        try:
+            report = inspect_psx_map(read_gmp_file(psx_gmp_path))
+        except (OSError, PsxMapError) as error:
+            report = dict(error = f"{type(error).__name__}: {error}")
+            num_failed += 1
+        reports.append(dict(map = str(psx_gmp_path), **report))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(dict(maps = reports), file, indent=2)
+    else:
+        json.dump(dict(maps = reports), sys.stdout, indent=2)
+        print("")
+
+    if num_failed:
+        sys.exit(-1)
+
+############ Validation
+
+MAX_REPORTED_PROBLEMS = 50      # per check, the problems above it are only counted
+
+def validate_psx_map(gmp_data):
+    """Check the structure of a PSX map buffer without decoding it.
+
+    Walks the chunks, every column the base table points to with its block
+    ids, and the ZONE, ANIM and RGEN records. Returns a report with every
+    problem found: errors make the conversion fail or produce garbage,
+    warnings are oddities the conversion copes with."""
+    problems = []
+    problem_counts = Counter()
+    severity_counts = Counter()
+
+    def report_problem(check, message, offset=None, severity="error"):
+        problem_counts[check] += 1
+        severity_counts[severity] += 1
+        if problem_counts[check] <= MAX_REPORTED_PROBLEMS:
+            problem = dict(severity = severity, check = check, message = message)
+            if offset is not None:
+                problem["offset"] = offset
+            problems.append(problem)
+
+    def get_report():
+        return dict(valid = severity_counts["error"] == 0,
+                    errors = severity_counts["error"],
+                    warnings = severity_counts["warning"],
+                    problem_counts = dict(problem_counts),
+                    problems = problems)
+
+    # chunks
+    try:
+        chunk_index = scan_psx_chunks(gmp_data)
+    except PsxMapError as error:
+        report_problem("chunks", str(error))
+        return get_report()
+
+    chunk_infos, cmap_info = get_chunk_infos(chunk_index)
+    try:
+        check_required_chunks(chunk_infos)
+    except PsxMissingChunkError as error:
+        report_problem("chunks", str(error))
+
+    psx_views = get_psx_map_views(gmp_data, chunk_infos, cmap_info)
+
+    # block tables
+    num_complete_blocks = cmap_info["num_complete_blocks"]
+    num_lid_blocks_only = cmap_info["num_lid_blocks_only"]
+    if num_complete_blocks > 32768:
+        report_problem("blocks", f"{num_complete_blocks} complete blocks, only 32768 can be addressed",
+                       cmap_info["block_info_1_start"])
+    if num_lid_blocks_only > 32768:
+        report_problem("blocks", f"{num_lid_blocks_only} lid only blocks, only 32768 can be addressed",
+                       cmap_info["block_info_2_start"])
+
+    valid_block_ids = bytearray(65536)
+    valid_block_ids[:min(num_complete_blocks, 32768)] = bytes([1])*min(num_complete_blocks, 32768)
+    valid_block_ids[32768 : 32768 + min(num_lid_blocks_only, 32768)] = bytes([1])*min(num_lid_blocks_only, 32768)
+
+    # base table and columns, every distinct column is checked once
+    base_table = read_words(psx_views["base_table"])
+    column_words = read_words(psx_views["columns"])
+    num_column_words = len(column_words)
+    base_table_offset = chunk_infos["CMAP"][0]
+    column_start = cmap_info["column_start"]
+
+    first_cells = {}
+    for cell_idx, words_offset in enumerate(base_table):
+        first_cells.setdefault(words_offset, cell_idx)
+
+    for words_offset, cell_idx in first_cells.items():
+        y, x = divmod(cell_idx, MAP_WIDTH+1)
+        if words_offset >= num_column_words:
+            report_problem("base_table", f"Cell ({x}, {y}) points to column word {words_offset}, "
+                                         f"past the {num_column_words} column words", base_table_offset + 2*cell_idx)
+            continue
+
+        column_file_offset = column_start + 2*words_offset
+        column_header = column_words[words_offset]
+        column_height = column_header & 0xFF
+        column_offset = column_header >> 8
+
+        if column_height > MAP_MAX_Z+1 or column_offset > MAP_MAX_Z:
+            report_problem("columns", f"Column of cell ({x}, {y}) has height {column_height} and offset {column_offset}, "
+                                      f"above the {MAP_MAX_Z+1} map levels", column_file_offset)
+            continue
+        if column_offset > column_height:
+            report_problem("columns", f"Column of cell ({x}, {y}) has offset {column_offset} above its height {column_height}",
+                           column_file_offset)
+            continue
+
+        num_blocks = column_height - column_offset
+        if words_offset + 1 + num_blocks > num_column_words:
+            report_problem("columns", f"Column of cell ({x}, {y}) goes past the end of the column words", column_file_offset)
+            continue
+
+        block_ids = column_words[words_offset + 1 : words_offset + 1 + num_blocks]
+        for z, block_id in enumerate(block_ids, column_offset):
+            if not valid_block_ids[block_id]:
+                if block_id < 32768:
+                    message = f"complete block {block_id}, the map has {num_complete_blocks}"
+                else:
+                    message = f"lid only block {block_id - 32768}, the map has {num_lid_blocks_only}"
+                report_problem("block_ids", f"Block ({x}, {y}, {z}) is {message}",
+                               column_file_offset + 2*(1 + z - column_offset))
+
+    # ZONE
+    if psx_views["ZONE"] is not None:
+        zone_offset = chunk_infos["ZONE"][0]
+        try:
+            zone_table = ZoneTable(psx_views["ZONE"])
+        except PsxMapError as error:
+            report_problem("zones", str(error), zone_offset)
+        else:
+            for zone_idx, zone in enumerate(zone_table):
+                if zone.w == 0 or zone.h == 0:
+                    report_problem("zones", f"Zone {zone_idx} ({zone.name}) is empty: {zone.w}x{zone.h}",
+                                   zone_offset + zone_table.name_offsets[zone_idx] - ZONE_TYPE_COORDS_DATA_SIZE - 1, "warning")
+                elif zone.x + zone.w > MAP_WIDTH+1 or zone.y + zone.h > MAP_HEIGHT+1:
+                    report_problem("zones", f"Zone {zone_idx} ({zone.name}) goes past the map edge: "
+                                            f"({zone.x}, {zone.y}) {zone.w}x{zone.h}",
+                                   zone_offset + zone_table.name_offsets[zone_idx] - ZONE_TYPE_COORDS_DATA_SIZE - 1, "warning")
+
+    # ANIM
+    if psx_views["ANIM"] is not None:
+        anim_offset = chunk_infos["ANIM"][0]
+        try:
+            anim_table = AnimTable(psx_views["ANIM"])
+        except PsxMapError as error:
+            report_problem("anims", str(error), anim_offset)
+        else:
+            for anim_idx, anim_length in enumerate(anim_table.lengths):
+                if anim_length == 0:
+                    report_problem("anims", f"Animation {anim_idx} of tile {anim_table.bases[anim_idx]} has no frames",
+                                   severity="warning")
+
+    # RGEN
+    if psx_views["RGEN"] is not None and len(psx_views["RGEN"]) % 2:
+        report_problem("rgen", f"RGEN chunk size {len(psx_views['RGEN'])} isn't a whole number of words",
+                       chunk_infos["RGEN"][0], "warning")
+
+    return get_report()
+
+def main_validate(argv):
+    parser = argparse.ArgumentParser(f"{PROGRAM_NAME} validate",
+                                     description="Check the structure of PSX gmp maps and print the problems found as JSON.")
+    parser.add_argument("psx_gmp_paths", nargs='+', help="PSX gmp files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file instead of the standard output")
+    args = parser.parse_args(argv)
+
+    gmp_paths = []
+    for psx_gmp_path in args.psx_gmp_paths:
+        if Path(psx_gmp_path).is_file():
+            gmp_paths.append(Path(psx_gmp_path))
+        else:
+            gmp_paths.extend(find_psx_maps(psx_gmp_path))
+
+    reports = []
+    num_invalid = 0
+    for psx_gmp_path in gmp_paths:
+        try:
+            report = validate_psx_map(read_gmp_file(psx_gmp_path))
+        except OSError as error:
+            report = dict(valid = False, error = f"{type(error).__name__}: {error}")
+        if not report["valid"]:
+            num_invalid += 1
+        reports.append(dict(map = str(psx_gmp_path), **report))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(dict(maps = reports), file, indent=2)
+    else:
+        json.dump(dict(maps = reports), sys.stdout, indent=2)
+        print("")
+
+    if num_invalid or not gmp_paths:
+        sys.exit(-1)
+
+############ Verification
+
+# (field, first byte, last byte) of a 12-byte block, used to name UMAP differences
+BLOCK_DIFF_FIELDS = tuple( (face, face_offset, face_offset+2) for face, face_offset, _ in BLOCK_FACES ) + \
+                    ( ("arrows", 10, 11), ("slope", 11, 12) )
+
+def first_difference(data_1, data_2):
+    """Return the offset of the first byte that differs between two buffers, or None if they are equal.
+
+    Halves the compared range with slice compares instead of walking the bytes."""
+    data_1 = memoryview(data_1)
+    data_2 = memoryview(data_2)
+    common_size = min(len(data_1), len(data_2))
+    if data_1[:common_size] == data_2[:common_size]:
+        return None if len(data_1) == len(data_2) else common_size
+
+    low = 0
+    high = common_size
+    while high - low > 1:
+        middle = (low + high) // 2
+        if data_1[low:middle] == data_2[low:middle]:
+            low = middle
+        else:
+            high = middle
+    return low
+
+def diff_umap(umap_data, reference_umap_data, max_diffs):
+    """Return the number of differing UMAP fields and the first max_diffs of them as (x, y, z, field, value, expected).
+
+    Whole rows of 256 blocks are compared first, only the blocks of the rows
+    that differ are compared one by one."""
+    umap_data = memoryview(umap_data)
+    reference_umap_data = memoryview(reference_umap_data)
+
+    num_diffs = 0
+    diffs = []
+    for row_idx in range((MAP_MAX_Z+1)*(MAP_HEIGHT+1)):
+        row_start = row_idx*UMAP_ROW_SIZE
+        row_end = row_start + UMAP_ROW_SIZE
+        if umap_data[row_start:row_end] == reference_umap_data[row_start:row_end]:
+            continue
+
+        z, y = divmod(row_idx, MAP_HEIGHT+1)
+        for x in range(MAP_WIDTH+1):
+            block_start = row_start + x*BLOCK_INFO_SIZE
+            block_data = umap_data[block_start : block_start + BLOCK_INFO_SIZE]
+            reference_block_data = reference_umap_data[block_start : block_start + BLOCK_INFO_SIZE]
+            if block_data == reference_block_data:
+                continue
+
+            for field, field_start, field_end in BLOCK_DIFF_FIELDS:
+                value = int.from_bytes(block_data[field_start:field_end], 'little')
+                expected = int.from_bytes(reference_block_data[field_start:field_end], 'little')
+                if value != expected:
+                    num_diffs += 1
+                    if len(diffs) < max_diffs:
+                        diffs.append( (x, y, z, field, value, expected) )
+
+    return num_diffs, diffs
+
+def diff_pc_maps(gmp_data, reference_gmp_data, max_diffs=100):
+    """Compare two PC gmp maps chunk by chunk and return a report of their differences.
+
+    Compressed maps are compared on their decoded UMAP, so the differences
+    are always given as block coordinates. Maps stored in different map
+    chunks (UMAP, DMAP or CMAP) are reported under a combined name such as
+    "UMAP/DMAP"."""
+    pc_chunks = read_pc_map(gmp_data)
+    reference_pc_chunks = read_pc_map(reference_gmp_data)
+
+    report = dict(equal = True, chunks = {})
+
+    map_chunk_names = ("UMAP", "DMAP", "CMAP")
+    chunk_names = list(dict.fromkeys(list(pc_chunks) + list(reference_pc_chunks)))
+
+    map_chunk_name = next(( chunk_name for chunk_name in map_chunk_names if chunk_name in pc_chunks ), None)
+    reference_map_chunk_name = next(( chunk_name for chunk_name in map_chunk_names if chunk_name in reference_pc_chunks ),
+                                    None)
+    mixed_map_chunks = None not in (map_chunk_name, reference_map_chunk_name) and map_chunk_name != reference_map_chunk_name
+    if mixed_map_chunks:
+        mixed_map_chunk_name = f"{map_chunk_name}/{reference_map_chunk_name}"
+        chunk_names = [ mixed_map_chunk_name if chunk_name == map_chunk_name else chunk_name
+                        for chunk_name in chunk_names if chunk_name != reference_map_chunk_name ]
+
+    for chunk_name in chunk_names:
+        if mixed_map_chunks and chunk_name == mixed_map_chunk_name:
+            chunk_data = bytes(get_pc_umap(pc_chunks))
+            reference_chunk_data = bytes(get_pc_umap(reference_pc_chunks))
+        else:
+            chunk_data = pc_chunks.get(chunk_name)
+            reference_chunk_data = reference_pc_chunks.get(chunk_name)
+
+        if chunk_data is None or reference_chunk_data is None:
+            chunk_report = dict(status = "missing" if chunk_data is None else "unexpected")
+        elif chunk_data == reference_chunk_data:
+            chunk_report = dict(status = "equal")
+        else:
+            chunk_report = dict(status = "different", size = len(chunk_data), expected_size = len(reference_chunk_data),
+                                first_difference = first_difference(chunk_data, reference_chunk_data))
+            if chunk_name in map_chunk_names or (mixed_map_chunks and chunk_name == mixed_map_chunk_name):
+                if chunk_name == "UMAP" or mixed_map_chunks:
+                    umap_data, reference_umap_data = chunk_data, reference_chunk_data
+                else:
+                    umap_data, reference_umap_data = get_pc_umap(pc_chunks), get_pc_umap(reference_pc_chunks)
+                num_diffs, diffs = diff_umap(umap_data, reference_umap_data, max_diffs)
+                chunk_report["num_block_diffs"] = num_diffs
+                chunk_report["block_diffs"] = [ dict(x = x, y = y, z = z, field = field, value = value, expected = expected)
+                                                for x, y, z, field, value, expected in diffs ]
+
+        if chunk_report["status"] != "equal":
+            report["equal"] = False
+        report["chunks"][chunk_name] = chunk_report
+
+    return report
+
+def verify_map_entry(psx_gmp_path, reference_path, edit_file, compression, max_diffs, rgen=False):
+    """Convert one map in memory, diff it against its reference and return the summary."""
+    start_time = time.perf_counter()
+    result = dict(map = Path(psx_gmp_path).name, reference = str(reference_path), status = "OK")
+    try:
+        edit_data = None
+        if edit_file is not None:
+            with open(edit_file, 'rb') as file:
+                edit_data = file.read()
+
+        gmp_data = convert(read_gmp_file(psx_gmp_path), edit_data, compression, rgen)
+        report = diff_pc_maps(gmp_data, read_gmp_file(reference_path), max_diffs)
+        result["chunks"] = report["chunks"]
+        if not report["equal"]:
+            different_chunks = [ chunk_name for chunk_name, chunk_report in report["chunks"].items()
+                                 if chunk_report["status"] != "equal" ]
+            result["status"] = "DIFFERENT: " + ", ".join(different_chunks)
+    except (OSError, PsxMapError, PcMapError, ValueError) as error:
+        result["status"] = f"FAILED: {type(error).__name__}: {error}"
+    result["time"] = time.perf_counter() - start_time
+    return result
+
+def main_verify(argv):
+    parser = argparse.ArgumentParser(f"{PROGRAM_NAME} verify",
+                                     description="Convert PSX gmp maps and compare the result with reference PC gmp maps.")
+    parser.add_argument("psx_maps_path", help="PSX gmp file, directory or glob pattern of PSX gmp files")
+    parser.add_argument("reference_path",
+                        help="reference PC gmp file, or directory of psx_<map name>.gmp files as written by batch")
+    parser.add_argument("edit_file", nargs='?',
+                        help="edit file of a single map (default: none, as when converting it; "
+                             "with a reference directory the matching *_edit.data, as batch does)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--compress", choices=["dmap", "cmap"], help="compression the references were written with")
+    parser.add_argument("--rgen", action="store_true", help="the references were written with the RGEN chunk")
+    parser.add_argument("--max-diffs", type=int, default=20, help="UMAP differences listed per map (default: 20)")
+    parser.add_argument("-o", "--output", help="write the full JSON report to this file")
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    reference_path = Path(args.reference_path)
+    if reference_path.is_dir():
+        gmp_paths = find_psx_maps(args.psx_maps_path)
+        entries = [ (psx_gmp_path, reference_path / f"psx_{psx_gmp_path.stem.lower()}.gmp", find_edit_file(psx_gmp_path))
+                    for psx_gmp_path in gmp_paths ]
+    else:
+        psx_gmp_path = Path(args.psx_maps_path)
+        edit_file = None if args.edit_file is None else ROOT_DIR / args.edit_file
+        entries = [ (psx_gmp_path, reference_path, edit_file) ] if psx_gmp_path.is_file() else []
+
+    if not entries:
+        print(f"No PSX gmp files found at {args.psx_maps_path}")
+        sys.exit(-1)
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=min(args.jobs, len(entries))) as executor:
+        futures = [ executor.submit(verify_map_entry, psx_gmp_path, map_reference_path, edit_file, args.compress, args.max_diffs,
+                                    args.rgen)
+                    for psx_gmp_path, map_reference_path, edit_file in entries ]
+        results = [ future.result() for future in futures ]
+
+    num_failed = 0
+    for result in results:
+        print(f"{result['map']:<24} {result['time']:8.2f}s  {result['status']}")
+        if result["status"] == "OK":
+            continue
+        num_failed += 1
+
+        for chunk_name, chunk_report in result.get("chunks", {}).items():
+            if chunk_report["status"] == "equal":
+                continue
+            if chunk_report["status"] != "different":
+                print(f"    {chunk_name}: {chunk_report['status']}")
+                continue
+            print(f"    {chunk_name}: {chunk_report['size']:,} bytes, expected {chunk_report['expected_size']:,}, "
+                  f"first difference at {hex(chunk_report['first_difference'])}")
+            if "num_block_diffs" in chunk_report:
+                print(f"    {chunk_report['num_block_diffs']} differing block fields")
+                for diff in chunk_report["block_diffs"]:
+                    print(f"      x={diff['x']} y={diff['y']} z={diff['z']} {diff['field']}: "
+                          f"{diff['value']} (expected {diff['expected']})")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(dict(maps = results), file, indent=2)
+
+    print(f"\n{len(results) - num_failed} identical, {num_failed} different or failed in {time.perf_counter() - start_time:.2f}s")
+
+    if num_failed:
+        sys.exit(-1)
+
+SUBCOMMANDS = dict(batch = main_batch,
+                   inspect = main_inspect,
+                   tiles = main_tiles,
+                   validate = main_validate,
+                   verify = main_verify)
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(PROGRAM_NAME)
+    parser.add_argument("psx_gmp_path")
+    parser.add_argument("output_gmp_filename")
+    parser.add_argument("edit_file", nargs='?')
+    parser.add_argument("--engine", choices=["volume", "reference"], default="volume",
+                        help="CMAP decompression engine (default: volume)")
+    parser.add_argument("--compress", choices=["dmap", "cmap"],
+                        help="write a compressed DMAP (32-bit) or CMAP (16-bit) map instead of the UMAP")
+    parser.add_argument("--index-cache", action="store_true",
+                        help=f"keep the chunk index of each map in a {CHUNK_INDEX_CACHE_SUFFIX} file next to it")
+    parser.add_argument("--compare-engines", action="store_true",
+                        help="run both CMAP engines and fail if their UMAP output differs")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only patch what changed since the last run of this output (UMAP output only)")
+    parser.add_argument("--profile", metavar="REPORT_PATH",
+                        help="write a JSON report with per stage timings, IO counters and block id stats")
+    parser.add_argument("--profile-dump", metavar="DUMP_PATH", help="also write a cProfile dump of the conversion")
+    parser.add_argument("--profile-allocations", action="store_true",
+                        help="also report the allocation peak of every stage in the --profile report (slows the stages down)")
+    parser.add_argument("--cache-dir", help="reuse the outputs of previous conversions kept in this directory")
+    parser.add_argument("--cache-size", type=int, default=CONVERSION_CACHE_SIZE // 2**20,
+                        help=f"maximum size of the conversion cache in MB (default: {CONVERSION_CACHE_SIZE // 2**20})")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and reconvert the map whenever it or its edit file change")
+    parser.add_argument("--validate", action="store_true",
+                        help="check the structure of the map first and stop if it has errors")
+    parser.add_argument("--rgen", action="store_true",
+                        help="copy the RGEN chunk to the PC map (its layout isn't documented, it's copied unchanged)")
+    parser.add_argument("--region", metavar="X0,Y0,X1,Y1[,Z0,Z1]",
+                        help="only convert the blocks inside these inclusive bounds, the rest of the map is left empty")
+    parser.add_argument("--raw", action="store_true",
+                        help="with --region, write the bare [z][y][x] block array of the region instead of a gmp")
+    parser.add_argument("--poll-interval", type=float, default=WATCH_POLL_INTERVAL,
+                        help=f"seconds between two checks of the watched files (default: {WATCH_POLL_INTERVAL})")
+    args = parser.parse_args()
+
+    if args.incremental and args.compress:
+        parser.error("--incremental only works with the UMAP output, not with --compress")
+    if args.incremental and args.cache_dir:
+        parser.error("--incremental patches the output in place, it can't be used with --cache-dir")
+    if args.compare_engines and args.cache_dir:
+        parser.error("--compare-engines needs the map to be decoded, it can't be used with --cache-dir")
+    if args.watch and (args.incremental or args.cache_dir or args.compare_engines or args.profile or args.profile_dump):
+        parser.error("--watch can't be used with --incremental, --cache-dir, --compare-engines or the profile options")
+    if (args.incremental or args.region) and args.profile:
+        parser.error("--incremental and --region don't go through the profiled stages, they can't be used with --profile")
+    if args.region and (args.incremental or args.cache_dir or args.compare_engines or args.watch):
+        parser.error("--region can't be used with --incremental, --cache-dir, --compare-engines or --watch")
+    if args.raw and (not args.region or args.compress):
+        parser.error("--raw needs --region and can't be used with --compress")
+
+    region = None
+    if args.region:
+        try:
+            region = parse_region(args.region)
+        except ValueError as error:
+            parser.error(str(error))
+
+    if (not args.psx_gmp_path or not args.output_gmp_filename):
+        print("Usage: python [program path] [psx gmp path] [output gmp filename]")
+        sys.exit(-1)
+
+    # get input gmp path
+    if ("\\" not in args.psx_gmp_path and "/" not in args.psx_gmp_path):
+        psx_gmp_path = ROOT_DIR / args.psx_gmp_path
+    else:
+        psx_gmp_path = Path(args.psx_gmp_path)
+
+    # verify if the input gmp map exists
+    if (not psx_gmp_path.exists()):
+        print(f"Input gmp file doesn't exists. Path: {psx_gmp_path}")
+        sys.exit(-1)
+
+    if args.edit_file:
+        edit_file = args.edit_file
+    else:
+        edit_file = None
+
+    output_path = ROOT_DIR / args.output_gmp_filename
+
+    if args.validate:
+        report = validate_psx_map(read_gmp_file(psx_gmp_path))
+        for problem in report["problems"]:
+            print(f"{problem['severity'].upper()}: {problem['check']}: {problem['message']}")
+        if not report["valid"]:
+            print(f"ERROR: the map has {report['errors']} errors, not converting it")
+            sys.exit(-1)
+
+    if args.watch:
+        watch_maps([ MapWatcher(psx_gmp_path, output_path, edit_file, args.compress, args.rgen) ], args.poll_interval)
+        return
+
+    if args.profile_allocations and args.profile is None:
+        parser.error("--profile-allocations needs --profile")
+
+    profile = None if args.profile is None else new_profile(args.profile_allocations)
+    profiler = None if args.profile_dump is None else cProfile.Profile()
+
+    try:
+        if profiler is not None:
+            profiler.enable()
+        if region is not None:
+            num_blocks = convert_psx_region(psx_gmp_path, output_path, region, edit_file, args.compress, args.raw, args.rgen)
+            print(f"Region ({region.x0}, {region.y0}, {region.z0})-({region.x1}, {region.y1}, {region.z1}): "
+                  f"{num_blocks:,} blocks")
+        elif args.incremental:
+            convert_psx_file_incremental(psx_gmp_path, output_path, edit_file, args.index_cache, args.rgen)
+        elif args.cache_dir:
+            convert_psx_file_cached(psx_gmp_path, output_path, edit_file, args.cache_dir, args.cache_size*2**20, args.engine,
+                                    args.compress, profile, args.index_cache, args.rgen)
+        else:
+            convert_psx_file(psx_gmp_path, output_path, edit_file, args.engine, args.compare_engines, args.compress, profile,
+                             args.index_cache, args.rgen)
+    except PsxMapError as error:
+        print(f"ERROR: {error}")
+        sys.exit(-1)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile_dump)
+
+    if profile is not None:
+        write_profile(profile, args.profile)
+        print(f"Profile report written to {args.profile}")
+
+    print("Success!")
+        
+
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,172 @@
+from pathlib import Path
+import argparse
+import random
+import struct
+import sys
+import os
+
+from convert_psx_map import (
+    MAP_WIDTH, MAP_HEIGHT, MAP_MAX_Z,
+    FIRST_CMAP_PADDING_SIZE, SECOND_CMAP_PADDING_SIZE, pad_psx_chunk,
+)
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+
+MAX_COLUMN_WORDS = 65535
+MAX_COMPLETE_BLOCKS = 32768
+MAX_LID_BLOCKS_ONLY = 32768
+
+FIXED_SLOPE_TILE = 384      # the tile fix_psx_slope turns into 1023
+
+def random_side(rng):
+    return rng.randrange(1 << 16)
+
+def random_slope_byte(rng, slope_density):
+    ground_type = rng.randrange(4)
+    if rng.random() < slope_density:
+        slope_type = rng.randint(1, 60)
+    else:
+        slope_type = rng.choice([0, 61, 62, 63])     # flat or not a slope for is_slope
+    return (slope_type << 2) | ground_type
+
+def random_lid(rng, slope_byte):
+    lid = rng.randrange(1 << 16)
+    # give some 3-sided slopes the tile that needs fixing
+    if 49 <= (slope_byte >> 2) <= 52 and rng.random() < 0.5:
+        lid = (lid & ~1023) | FIXED_SLOPE_TILE
+    return lid
+
+def generate_complete_blocks(rng, num_blocks, slope_density):
+    blocks = []
+    for _ in range(num_blocks):
+        slope_byte = random_slope_byte(rng, slope_density)
+        sides = [ random_side(rng) for _ in range(4) ]
+        lid = random_lid(rng, slope_byte)
+        arrows = rng.randrange(256)
+        blocks.append(struct.pack('<5H2B', *sides, lid, arrows, slope_byte))
+    return b"".join(blocks)
+
+def generate_lid_blocks(rng, num_blocks, slope_density):
+    blocks = []
+    for _ in range(num_blocks):
+        slope_byte = random_slope_byte(rng, slope_density)
+        lid = random_lid(rng, slope_byte)
+        arrows = rng.randrange(256)
+        blocks.append(struct.pack('<H2B', lid, arrows, slope_byte))
+    return b"".join(blocks)
+
+def generate_columns(rng, num_columns, num_complete_blocks, num_lid_blocks_only, lid_only_ratio):
+    """Return the column words data and the word offset of every column."""
+    column_data = []
+    column_word_offsets = []
+    column_words = 0
+
+    for _ in range(num_columns):
+        column_offset = rng.randint(0, 3)
+        column_height = rng.randint(column_offset, MAP_MAX_Z)
+
+        block_ids = []
+        for _ in range(column_height - column_offset):
+            if num_lid_blocks_only and (rng.random() < lid_only_ratio or not num_complete_blocks):
+                block_ids.append(32768 + rng.randrange(num_lid_blocks_only))
+            else:
+                block_ids.append(rng.randrange(num_complete_blocks))
+
+        column = bytes([column_height, column_offset]) + struct.pack(f'<{len(block_ids)}H', *block_ids)
+
+        column_word_offsets.append(column_words)
+        column_data.append(column)
+        column_words += len(column) // 2
+
+    if column_words > MAX_COLUMN_WORDS:
+        raise ValueError(f"{num_columns} columns need {column_words} words, more than the {MAX_COLUMN_WORDS} a PSX CMAP can address")
+
+    return b"".join(column_data), column_word_offsets
+
+def generate_cmap(rng, num_columns, column_sharing, num_complete_blocks, num_lid_blocks_only, slope_density, lid_only_ratio):
+    column_data, column_word_offsets = generate_columns(rng, num_columns, num_complete_blocks, num_lid_blocks_only, lid_only_ratio)
+
+    # every cell either reuses the previous column (roads, empty ground...) or picks any column
+    base_table = []
+    previous_offset = column_word_offsets[0]
+    for _ in range((MAP_WIDTH+1)*(MAP_HEIGHT+1)):
+        if rng.random() >= column_sharing:
+            previous_offset = rng.choice(column_word_offsets)
+        base_table.append(previous_offset)
+
+    return b"".join([ struct.pack('<65536H', *base_table),
+                      struct.pack('<H', len(column_data) // 2),
+                      column_data,
+                      bytes(FIRST_CMAP_PADDING_SIZE),
+                      struct.pack('<H', num_complete_blocks),
+                      generate_complete_blocks(rng, num_complete_blocks, slope_density),
+                      bytes(SECOND_CMAP_PADDING_SIZE),
+                      struct.pack('<H', num_lid_blocks_only),
+                      generate_lid_blocks(rng, num_lid_blocks_only, slope_density) ])
+
+def generate_zones(rng, num_zones):
+    zones = []
+    for zone_idx in range(num_zones):
+        zone_name = f"zone_{zone_idx}".encode('ascii')
+        x = rng.randrange(MAP_WIDTH)
+        y = rng.randrange(MAP_HEIGHT)
+        w = rng.randint(1, MAP_WIDTH - x)
+        h = rng.randint(1, MAP_HEIGHT - y)
+        zones.append(bytes([rng.randrange(16), x, y, w, h, len(zone_name)]) + zone_name)
+    return b"".join(zones)
+
+def generate_anims(rng, num_anims):
+    anims = []
+    for _ in range(num_anims):
+        anim_length = rng.randint(1, 8)
+        tiles = [ rng.randrange(1024) for _ in range(anim_length) ]
+        anims.append(struct.pack(f'<H4B{anim_length}H', rng.randrange(1024), rng.randint(1, 10), 0, anim_length, 0, *tiles))
+    return b"".join(anims)
+
+def generate_psx_map(seed=0, num_columns=3000, column_sharing=0.5, num_complete_blocks=4000, num_lid_blocks_only=1000,
+                     slope_density=0.2, lid_only_ratio=0.2, num_zones=64, num_anims=32, rgen_size=256):
+    """Build the bytes of a PSX gmp file with CMAP, ZONE, ANIM and RGEN chunks."""
+    if not 0 < num_complete_blocks <= MAX_COMPLETE_BLOCKS - 1:
+        raise ValueError(f"num_complete_blocks must be between 1 and {MAX_COMPLETE_BLOCKS - 1}")
+    if not 0 <= num_lid_blocks_only <= MAX_LID_BLOCKS_ONLY - 1:
+        raise ValueError(f"num_lid_blocks_only must be between 0 and {MAX_LID_BLOCKS_ONLY - 1}")
+
+    rng = random.Random(seed)
+
+    cmap_data = generate_cmap(rng, num_columns, column_sharing, num_complete_blocks, num_lid_blocks_only, slope_density, lid_only_ratio)
+    zone_data = generate_zones(rng, num_zones)
+    anim_data = generate_anims(rng, num_anims)
+    rgen_data = rng.randbytes(rgen_size)
+
+    return b"".join([ b"CMAP", struct.pack('<I', len(cmap_data)), pad_psx_chunk(cmap_data),
+                      b"ZONE", struct.pack('<I', len(zone_data)), pad_psx_chunk(zone_data),
+                      b"ANIM", struct.pack('<I', len(anim_data)), pad_psx_chunk(anim_data),
+                      # RGEN is the last chunk and isn't padded, it ends 2 bytes after its size
+                      b"RGEN", struct.pack('<I', len(rgen_data)), rgen_data, bytes(2) ])
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Generate a synthetic PSX gmp map.")
+    parser.add_argument("output_path")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--columns", type=int, default=3000, help="number of distinct columns (default: 3000)")
+    parser.add_argument("--column-sharing", type=float, default=0.5,
+                        help="chance of a cell reusing the column of the previous cell (default: 0.5)")
+    parser.add_argument("--complete-blocks", type=int, default=4000, help="number of complete blocks (default: 4000)")
+    parser.add_argument("--lid-blocks", type=int, default=1000, help="number of lid only blocks (default: 1000)")
+    parser.add_argument("--slope-density", type=float, default=0.2, help="chance of a block being a slope (default: 0.2)")
+    parser.add_argument("--lid-only-ratio", type=float, default=0.2,
+                        help="chance of a column block being a lid only block (default: 0.2)")
+    parser.add_argument("--zones", type=int, default=64)
+    parser.add_argument("--anims", type=int, default=32)
+    args = parser.parse_args()
+
+    gmp_data = generate_psx_map(args.seed, args.columns, args.column_sharing, args.complete_blocks, args.lid_blocks,
+                                args.slope_density, args.lid_only_ratio, args.zones, args.anims)
+
+    with open(Path(args.output_path), 'wb') as file:
+        file.write(gmp_data)
+
+    print("Generated {} ({:,} bytes)".format(args.output_path, len(gmp_data)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+from pathlib import Path
+import contextlib
+import tempfile
+import unittest
+import io
+
+from convert_psx_map import (
+    MAP_WIDTH, MAP_HEIGHT, BLOCK_INFO_SIZE, UMAP_SIZE, UMAP_PLANE_SIZE, UMAP_ROW_SIZE,
+    PsxCorruptMapError, PcMapError, CmapTooLargeError, convert, read_pc_map, get_pc_umap, scan_psx_chunks, get_chunk_infos, get_psx_map_views,
+    convert_psx_file, convert_psx_file_incremental, decode_region, parse_region, ZoneTable, validate_psx_map,
+    diff_pc_maps, encode_compressed_map,
+)
+from convert_pc_map import convert_pc_map
+from generate_psx_map import generate_psx_map
+
+# small synthetic maps keep the whole module at a few seconds
+TEST_MAP_OPTIONS = dict(num_columns=500, num_complete_blocks=1500, num_lid_blocks_only=300)
+
+def get_test_map(seed=0, **map_options):
+    return generate_psx_map(seed, **dict(TEST_MAP_OPTIONS, **map_options))
+
+def get_psx_views(psx_data):
+    chunk_infos, cmap_info = get_chunk_infos(scan_psx_chunks(psx_data))
+    return get_psx_map_views(psx_data, chunk_infos, cmap_info)
+
+def get_output_umap(pc_gmp_data):
+    return bytes(get_pc_umap(read_pc_map(pc_gmp_data)))
+
+class RoundTripTest(unittest.TestCase):
+
+    def test_psx_pc_psx_pc(self):
+        psx_data = get_test_map()
+        for compression in (None, "dmap", "cmap"):
+            for rgen in (False, True):
+                with self.subTest(compression=compression, rgen=rgen):
+                    pc_data = convert(psx_data, compression=compression, rgen=rgen)
+                    self.assertEqual(convert(convert_pc_map(pc_data), compression=compression, rgen=rgen), pc_data)
+
+    def test_compressed_maps_decode_to_the_umap(self):
+        psx_data = get_test_map()
+        umap_data = get_output_umap(convert(psx_data))
+        for compression in ("dmap", "cmap"):
+            with self.subTest(compression=compression):
+                self.assertEqual(get_output_umap(convert(psx_data, compression=compression)), umap_data)
+
+    def test_cmap_too_large(self):
+        # every cell gets its own blocks, far more than 16-bit block ids can address
+        umap_data = b"".join( block_idx.to_bytes(BLOCK_INFO_SIZE, 'little') for block_idx in range(UMAP_SIZE // BLOCK_INFO_SIZE) )
+        with self.assertRaises(CmapTooLargeError):
+            encode_compressed_map(umap_data, "cmap")
+
+class DiffTest(unittest.TestCase):
+
+    def test_diff_across_map_chunks(self):
+        psx_data = get_test_map()
+        report = diff_pc_maps(convert(psx_data, compression="dmap"), convert(psx_data))
+        self.assertTrue(report["equal"], report["chunks"])
+        self.assertEqual(report["chunks"]["DMAP/UMAP"], dict(status = "equal"))
+
+        report = diff_pc_maps(convert(psx_data, compression="cmap"), convert(get_test_map(1)))
+        self.assertFalse(report["equal"])
+        self.assertGreater(report["chunks"]["CMAP/UMAP"]["num_block_diffs"], 0)
+
+class IncrementalTest(unittest.TestCase):
+
+    def test_patch_matches_full_conversion(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            psx_gmp_path = Path(work_dir) / "TEST.GMP"
+            output_path = Path(work_dir) / "incremental.gmp"
+            full_output_path = Path(work_dir) / "full.gmp"
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                for seed in (0, 1):
+                    psx_gmp_path.write_bytes(get_test_map(seed))
+                    convert_psx_file_incremental(psx_gmp_path, output_path)
+                convert_psx_file(psx_gmp_path, full_output_path)
+
+            self.assertEqual(output_path.read_bytes(), full_output_path.read_bytes())
+
+class ZoneTableTest(unittest.TestCase):
+
+    def test_zones_at_matches_brute_force(self):
+        zone_table = ZoneTable(get_psx_views(get_test_map(num_zones=200))["ZONE"])
+        zones = list(zone_table)
+        for y in range(0, MAP_HEIGHT+1, 3):
+            for x in range(0, MAP_WIDTH+1, 3):
+                expected = tuple( zone_idx for zone_idx, zone in enumerate(zones)
+                                  if zone.x <= x < zone.x + zone.w and zone.y <= y < zone.y + zone.h )
+                self.assertEqual(zone_table.zones_at(x, y), expected, f"({x}, {y})")
+
+class RegionTest(unittest.TestCase):
+
+    def test_region_matches_cropped_umap(self):
+        psx_data = get_test_map()
+        psx_views = get_psx_views(psx_data)
+        umap_data = get_output_umap(convert(psx_data))
+        self.assertEqual(len(umap_data), UMAP_SIZE)
+
+        for region_text in ("0,0,255,255", "10,20,73,99", "200,5,200,5,2,6", "0,250,255,255,7,7"):
+            with self.subTest(region=region_text):
+                region = parse_region(region_text)
+                expected = b"".join( umap_data[z*UMAP_PLANE_SIZE + y*UMAP_ROW_SIZE + BLOCK_INFO_SIZE*region.x0 :
+                                               z*UMAP_PLANE_SIZE + y*UMAP_ROW_SIZE + BLOCK_INFO_SIZE*(region.x1 + 1)]
+                                     for z in range(region.z0, region.z1+1) for y in range(region.y0, region.y1+1) )
+                self.assertEqual(decode_region(psx_views, region), expected)
+
+    def test_invalid_regions(self):
+        for region_text in ("1,2,3", "5,5,4,4", "0,0,256,3", "0,0,1,1,3,8"):
+            with self.subTest(region=region_text):
+                with self.assertRaises(ValueError):
+                    parse_region(region_text)
+
+class CorruptMapTest(unittest.TestCase):
+
+    def test_out_of_range_base_table_entry(self):
+        psx_data = bytearray(get_test_map())
+        psx_data[8:10] = (65000).to_bytes(2, 'little')     # base table entry of cell (0, 0)
+
+        with self.assertRaises(PsxCorruptMapError):
+            convert(bytes(psx_data))
+
+        report = validate_psx_map(psx_data)
+        self.assertFalse(report["valid"])
+        self.assertEqual(report["problem_counts"], dict(base_table = 1))
+
+    def test_out_of_range_pc_block_id(self):
+        pc_chunks = read_pc_map(convert(get_test_map(), compression="dmap"))
+        dmap_data = bytearray(pc_chunks["DMAP"])
+        first_column = 4*int.from_bytes(dmap_data[:4], 'little')
+        dmap_data[4*256*256 + 4 + first_column + 4 : 4*256*256 + 4 + first_column + 8] = (10**6).to_bytes(4, 'little')
+        pc_chunks["DMAP"] = bytes(dmap_data)
+
+        with self.assertRaises(PcMapError):
+            get_pc_umap(pc_chunks)
+
+    def test_valid_map(self):
+        report = validate_psx_map(get_test_map())
+        self.assertTrue(report["valid"], report["problems"])
+
+if __name__ == "__main__":
+    unittest.main()